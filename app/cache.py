@@ -0,0 +1,162 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from app.compression import compress
+from app.config import settings
+
+
+class Payload:
+    """
+    Готовое тело JSON-ответа и его ETag, вычисленный один раз при записи в кеш
+
+    Сжатые варианты тела создаются при первом запросе с нужным Accept-Encoding и хранятся
+    в отдельном кеше encoded_cache со своим ограничением по объему (по ETag и кодировке),
+    поэтому популярные ответы не сжимаются заново на каждое попадание, а размер записей
+    кешей деталей фильмов и поиска по-прежнему равен размеру исходного тела
+    """
+
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    def encoded(self, encoding: str) -> bytes:
+        key = (self.etag, encoding)
+        body = encoded_cache.get(key)
+        if body is None:
+            body = compress(self.body, encoding)
+            encoded_cache.set(key, body, size=len(body))
+        return body
+
+    def __len__(self):
+        return len(self.body)
+
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at', 'stale_until', 'hits')
+
+    def __init__(self, value, size: int, expires_at: float, stale_until: float, hits: int = 0):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.hits = hits
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+class TTLCache:
+    """
+    In-process LRU-кеш с ограничением по числу записей и (опционально) по объему в байтах
+
+    Запись свежая до истечения ttl, после этого еще stale_ttl секунд ее можно
+    отдавать как устаревшую (stale-while-revalidate), пока вызывающий код
+    обновляет ее в фоне. Счетчики попаданий, промахов и вытеснений доступны
+    через stats()
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int | None = None, stale_ttl: float = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get_entry(self, key) -> CacheEntry | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        if now >= entry.stale_until:
+            # истекшая запись остается до вытеснения, ее может отдать peek()
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        entry.hits += 1
+        if now >= entry.expires_at:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def peek(self, key) -> CacheEntry | None:
+        """Запись без учета срока жизни и без влияния на счетчики и порядок LRU"""
+        return self._data.get(key)
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry.value
+
+    def set(self, key, value, size: int = 0, ttl: float | None = None):
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        hits = 0
+        if key in self._data:
+            # при обновлении записи сохраняется ее популярность
+            hits = self._remove(key).hits
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._data[key] = CacheEntry(value, size, expires_at, expires_at + self.stale_ttl, hits)
+        self._bytes += size
+        while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def expiring(self, within: float) -> list:
+        """(ключ, запись) для живых записей, которые устареют в ближайшие within секунд или уже устарели"""
+        now = time.monotonic()
+        return [
+            (key, entry) for key, entry in self._data.items()
+            if entry.expires_at - now <= within and now < entry.stale_until
+        ]
+
+    def _remove(self, key):
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._data),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# сжатые варианты Payload; ключ - (ETag исходного тела, кодировка), поэтому одинаковые
+# тела из разных кешей сжимаются и хранятся один раз
+encoded_cache = TTLCache(
+    max_entries=settings.COMPRESSED_CACHE_MAX_ENTRIES,
+    max_bytes=settings.COMPRESSED_CACHE_MAX_BYTES,
+    ttl=settings.COMPRESSED_CACHE_TTL,
+)
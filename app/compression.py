@@ -0,0 +1,173 @@
+import gzip
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:
+    # brotli не входит в обязательные зависимости: без него ответы сжимаются только gzip
+    brotli = None
+
+
+# сжимаются только текстовые ответы: JSON API и текстовый формат /metrics
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Кодировка сжатия из заголовка Accept-Encoding: br, если доступен brotli, иначе gzip
+
+    Кодировки с q=0 считаются запрещенными; None, если клиент не принимает ни одну
+    из поддерживаемых
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0: одинаковое тело всегда сжимается в одинаковые байты
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(content_type: str | None) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    # у сжатого представления свой сильный ETag: "<хеш>" -> "<хеш>-gzip"
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str, encoding: str) -> str | None:
+    # обратное преобразование; None, если тег не относится к представлению в encoding
+    suffix = f'-{encoding}"'
+    return etag[:-len(suffix)] + '"' if etag.endswith(suffix) else None
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware, которое сжимает текстовые ответы не меньше minimum_size байт
+
+    Ответы, у которых уже есть Content-Encoding (например, готовые сжатые данные из кеша
+    деталей фильмов и поиска), и потоковые ответы из нескольких частей передаются как есть.
+
+    Сжатый ответ получает ETag с суффиксом кодировки ("<хеш>-gzip"). В If-None-Match
+    обработчику дополнительно передается тег без суффикса, поэтому он сравнивает свой
+    обычный ETag; в ответе 304 на такой тег суффикс возвращается, и валидатор совпадает
+    с тем, что был у ответа 200
+    """
+
+    def __init__(self, app, minimum_size: int = settings.COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # теги сжатых представлений из If-None-Match -> те же теги без суффикса кодировки
+        decoded = {}
+        headers = []
+        for name, value in scope['headers']:
+            if name == b'if-none-match':
+                for tag in value.decode('latin-1').split(','):
+                    base = decoded_etag(tag.strip(), encoding)
+                    if base is not None:
+                        decoded[base] = tag.strip()
+                if decoded:
+                    value += (', ' + ', '.join(decoded)).encode('latin-1')
+            headers.append((name, value))
+        # scope меняется на месте, а не копируется: маршрутизатор записывает в него route,
+        # который читает внешнее MetricsMiddleware
+        scope['headers'] = headers
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                if message['status'] == 304:
+                    await send(self._not_modified(message, decoded))
+                    return
+                # заголовки откладываются до первой части тела: от нее зависит, сжимать ли ответ
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            response_start, start = start, None
+
+            headers = {name.lower(): value for name, value in response_start.get('headers', [])}
+            body = message.get('body', b'')
+            if (
+                b'content-encoding' in headers
+                or message.get('more_body', False)
+                or not is_compressible(headers.get(b'content-type', b'').decode('latin-1'))
+            ):
+                await send(response_start)
+                await send(message)
+                return
+
+            raw_headers = [
+                (name, value) for name, value in response_start.get('headers', [])
+                if name.lower() not in (b'content-length', b'vary', b'etag')
+            ]
+            vary = headers.get(b'vary')
+            if not vary:
+                vary = b'Accept-Encoding'
+            elif b'accept-encoding' not in vary.lower():
+                vary += b', Accept-Encoding'
+            raw_headers.append((b'vary', vary))
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                raw_headers.append((b'content-encoding', encoding.encode()))
+                if b'etag' in headers:
+                    headers[b'etag'] = encoded_etag(headers[b'etag'].decode('latin-1'), encoding).encode('latin-1')
+            if b'etag' in headers:
+                raw_headers.append((b'etag', headers[b'etag']))
+            raw_headers.append((b'content-length', str(len(body)).encode()))
+            await send({**response_start, 'headers': raw_headers})
+            await send({**message, 'body': body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _not_modified(message: dict, decoded: dict) -> dict:
+        # 304 на тег сжатого представления возвращает тот же тег, с суффиксом кодировки
+        raw_headers = []
+        for name, value in message.get('headers', []):
+            if name.lower() == b'etag' and value.decode('latin-1') in decoded:
+                value = decoded[value.decode('latin-1')].encode('latin-1')
+            raw_headers.append((name, value))
+        return {**message, 'headers': raw_headers}
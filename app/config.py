@@ -13,18 +13,144 @@ class Settings(BaseSettings):
 
     @model_validator(mode='before')
     def get_database_url(cls, values):
-        values['DATABASE_URL'] = f'postgresql+asyncpg://{values["DB_USER"]}:{values["DB_PASS"]}@{values["DB_HOST"]}:{values["DB_PORT"]}/{values["DB_NAME"]}'
+        # явно заданный DATABASE_URL (например, sqlite+aiosqlite для нагрузочных тестов) не перезаписывается
+        if not values.get('DATABASE_URL'):
+            values['DATABASE_URL'] = f'postgresql+asyncpg://{values["DB_USER"]}:{values["DB_PASS"]}@{values["DB_HOST"]}:{values["DB_PORT"]}/{values["DB_NAME"]}'
         return values
 
     
     DATABASE_URL: str = None
 
+    # профиль движка БД; размер пула задается на один воркер gunicorn
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 10
+    DB_POOL_RECYCLE: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
     SECRET_KEY: str 
     ALGORITHM: str = 'HS256'
 
+    # стоимость bcrypt и ограничение параллельного хеширования паролей
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_CONCURRENCY: int = 2
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5
+
     API_key: str
+    # дополнительные ключи API через запятую
+    API_KEYS: str = ''
+
+    @property
+    def api_keys(self) -> list[str]:
+        keys = f'{self.API_key},{self.API_KEYS}'.split(',')
+        return list(dict.fromkeys(key.strip() for key in keys if key.strip()))
+
+    # адрес API Кинопоиска; для нагрузочных тестов - локальный benchmarks/fake_kinopoisk.py
+    KINOPOISK_BASE_URL: str = 'https://kinopoiskapiunofficial.tech'
+
+    # пул HTTP-соединений к API Кинопоиска
+    KINOPOISK_POOL_LIMIT: int = 100
+    KINOPOISK_POOL_LIMIT_PER_HOST: int = 30
+    KINOPOISK_DNS_TTL: int = 300
+    KINOPOISK_KEEPALIVE_TIMEOUT: float = 30
+
+    # лимит исходящих запросов (token bucket) в расчете на один ключ API
+    KINOPOISK_RATE_LIMIT: float = 20
+    KINOPOISK_RATE_BURST: int = 20
+    KINOPOISK_RATE_MAX_QUEUE: int = 1000
+    KINOPOISK_RATE_MAX_WAIT: float = 5
+    KINOPOISK_RETRY_AFTER_DEFAULT: float = 1
+
+    # квота и охлаждение ключей API
+    KINOPOISK_KEY_DAILY_QUOTA: int = 500
+    KINOPOISK_KEY_UNAUTHORIZED_COOLDOWN: float = 60 * 60
+
+    # таймауты, повторы, автоматический выключатель и hedged-запросы
+    KINOPOISK_CONNECT_TIMEOUT: float = 2
+    KINOPOISK_READ_TIMEOUT: float = 5
+    KINOPOISK_TOTAL_TIMEOUT: float = 8
+    KINOPOISK_DEADLINE: float = 10
+    KINOPOISK_RETRIES: int = 2
+    KINOPOISK_RETRY_BACKOFF: float = 0.1
+    KINOPOISK_RETRY_BACKOFF_MAX: float = 1
+    KINOPOISK_BREAKER_FAILURES: int = 5
+    KINOPOISK_BREAKER_RESET_TIMEOUT: float = 30
+    KINOPOISK_HEDGE_ENABLED: bool = False
+    KINOPOISK_HEDGE_PERCENTILE: float = 95
+    KINOPOISK_HEDGE_MIN_SAMPLES: int = 50
+
+    # кеш деталей фильмов
+    FILM_CACHE_MAX_ENTRIES: int = 5000
+    FILM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    FILM_CACHE_TTL: float = 6 * 60 * 60
+    FILM_CACHE_STALE_TTL: float = 60 * 60
+
+    # кеш результатов поиска по ключевому слову
+    SEARCH_CACHE_MAX_ENTRIES: int = 10000
+    SEARCH_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SEARCH_CACHE_TTL: float = 15 * 60
+    SEARCH_CACHE_EMPTY_TTL: float = 60
+
+    # поиск по каталогу: режим по умолчанию (upstream, local или auto), число результатов
+    # и порог, ниже которого режим auto обращается к API Кинопоиска; результаты из каталога
+    # содержат только filmId, nameRu и description, поэтому local и auto включаются явно
+    SEARCH_DEFAULT_MODE: str = 'upstream'
+    SEARCH_LOCAL_LIMIT: int = 20
+    SEARCH_LOCAL_MIN_RESULTS: int = 3
+
+    # фоновое обновление деталей фильмов: период (с разбросом REFRESH_JITTER), число запросов
+    # к API за один проход, запас до истечения записи кеша, возраст данных каталога, после
+    # которого их нужно обновить, и доля дневной квоты ключей, которую обновление не трогает
+    REFRESH_ENABLED: bool = True
+    REFRESH_INTERVAL: float = 60
+    REFRESH_JITTER: float = 0.2
+    REFRESH_BUDGET: int = 20
+    REFRESH_AHEAD: float = 15 * 60
+    REFRESH_CATALOG_MAX_AGE: float = 7 * 24 * 60 * 60
+    REFRESH_QUOTA_RESERVE: float = 0.5
+    # после неудачного обновления строка каталога откладывается на REFRESH_RETRY_BACKOFF
+    # секунд, с каждой следующей неудачей вдвое дольше, но не больше REFRESH_RETRY_BACKOFF_MAX
+    REFRESH_RETRY_BACKOFF: float = 60 * 60
+    REFRESH_RETRY_BACKOFF_MAX: float = 7 * 24 * 60 * 60
+
+    # Cache-Control: сколько секунд клиент может не перепроверять детали фильма и результаты поиска
+    FILM_DETAILS_MAX_AGE: int = 5 * 60
+    SEARCH_MAX_AGE: int = 60
+
+    # сжатие ответов: тела меньше COMPRESSION_MIN_SIZE байт отдаются как есть;
+    # brotli используется, только если установлен пакет brotli
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    # кеш сжатых вариантов готовых ответов (деталей фильмов и поиска); его объем не входит
+    # в FILM_CACHE_MAX_BYTES и SEARCH_CACHE_MAX_BYTES и ограничивается отдельно
+    COMPRESSED_CACHE_MAX_ENTRIES: int = 10000
+    COMPRESSED_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    COMPRESSED_CACHE_TTL: float = 6 * 60 * 60
+
+    # пакетное добавление в избранное
+    FAVORITES_BATCH_MAX_SIZE: int = 500
+    FAVORITES_BATCH_CONCURRENCY: int = 10
+
+    # постраничный список избранного
+    FAVORITES_PAGE_DEFAULT_LIMIT: int = 100
+    FAVORITES_PAGE_MAX_LIMIT: int = 1000
+
+    # кеш аутентифицированных пользователей
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_TTL: float = 60
+
+    # кеш проверенных JWT
+    TOKEN_CACHE_MAX_ENTRIES: int = 50000
+    TOKEN_CACHE_TTL: float = 15 * 60
 
     LOG_LEVEL: str
+    # не больше LOG_WARNING_SAMPLE_LIMIT одинаковых предупреждений (одно место вызова)
+    # за LOG_WARNING_SAMPLE_WINDOW секунд; 0 отключает выборку
+    LOG_WARNING_SAMPLE_LIMIT: int = 20
+    LOG_WARNING_SAMPLE_WINDOW: float = 10
 
 
 
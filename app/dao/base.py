@@ -1,6 +1,15 @@
-from sqlalchemy import select, insert, delete
+from sqlalchemy import select, insert, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
+
+def upsert_insert(session: AsyncSession):
+    # INSERT с поддержкой ON CONFLICT для диалекта текущей сессии
+    return sqlite.insert if session.bind.dialect.name == 'sqlite' else postgresql.insert
+
+
+# Методы записи по умолчанию фиксируют транзакцию; commit=False позволяет
+# вызывающему коду объединить несколько операций в одну транзакцию
 class BaseDAO:
     model = None
 
@@ -17,23 +26,92 @@ class BaseDAO:
         return result.scalar_one_or_none()  
         
     @classmethod
-    async def add(cls,session: AsyncSession, **data):
-        query = insert(cls.model).values(**data)
-        await session.execute(query)
-        await session.commit()
-
-        query = select(cls.model).filter_by(**data)
+    async def add(cls, session: AsyncSession, commit: bool = True, **data):
+        # вставленная строка возвращается через RETURNING, без повторного SELECT
+        query = insert(cls.model).values(**data).returning(cls.model)
         result = await session.execute(query)
-        return result.scalar()    
+        row = result.scalar_one()
+        if commit:
+            await session.commit()
+        return row
+
+    @classmethod
+    async def add_many(cls, session: AsyncSession, rows: list, commit: bool = True):
+        # одна многострочная вставка с RETURNING
+        if not rows:
+            return []
+        result = await session.scalars(insert(cls.model).returning(cls.model), rows)
+        added = result.all()
+        if commit:
+            await session.commit()
+        return added
     
+    @classmethod
+    async def add_if_absent(cls, session: AsyncSession, conflict_columns: list, commit: bool = True, **data):
+        # один INSERT ... ON CONFLICT DO NOTHING: id новой строки или None, если такая уже есть
+        query = (
+            upsert_insert(session)(cls.model)
+            .values(**data)
+            .on_conflict_do_nothing(index_elements=conflict_columns)
+            .returning(cls.model.id)
+        )
+        result = await session.execute(query)
+        new_id = result.scalar_one_or_none()
+        if commit:
+            await session.commit()
+        return new_id
+
+    @classmethod
+    async def add_many_if_absent(cls, session: AsyncSession, conflict_columns: list, rows: list, commit: bool = True):
+        # одна многострочная вставка с ON CONFLICT DO NOTHING; возвращает только вставленные строки
+        if not rows:
+            return []
+        query = (
+            upsert_insert(session)(cls.model)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=conflict_columns)
+            .returning(cls.model)
+        )
+        result = await session.scalars(query)
+        added = result.all()
+        if commit:
+            await session.commit()
+        return added
+
+    @classmethod
+    async def upsert_many(cls, session: AsyncSession, conflict_columns: list, rows: list,
+                          update_columns: list, commit: bool = True):
+        # INSERT ... ON CONFLICT DO UPDATE: возвращает все строки, и новые, и обновленные
+        if not rows:
+            return []
+        stmt = upsert_insert(session)(cls.model).values(rows)
+        query = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={column: stmt.excluded[column] for column in update_columns},
+        ).returning(cls.model)
+        result = await session.scalars(query)
+        rows = result.all()
+        if commit:
+            await session.commit()
+        return rows
+
+    @classmethod
+    async def update(cls, session: AsyncSession, model_id: int, commit: bool = True, **data):
+        query = update(cls.model).where(cls.model.id == model_id).values(**data)
+        await session.execute(query)
+        if commit:
+            await session.commit()
+
     @classmethod 
-    async def del_by_id(cls, user_id: int, kinopoisk_id: int, session: AsyncSession): 
+    async def del_by_id(cls, user_id: int, kinopoisk_id: int, session: AsyncSession, commit: bool = True): 
         query = delete(cls.model).where(cls.model.user_id == user_id, cls.model.kinopoisk_id == kinopoisk_id) 
-        await session.execute(query) 
-        await session.commit()
+        result = await session.execute(query) 
+        if commit:
+            await session.commit()
+        return result.rowcount
 
     @classmethod
     async def get_all(cls, user_id: int, session: AsyncSession):
             query = select(cls.model).filter(cls.model.user_id == user_id)
             result = await session.execute(query)
-            return result.scalars().all()
\ No newline at end of file
+            return result.scalars().all()
@@ -1,18 +1,112 @@
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.monitoring.metrics import db_query_duration_seconds
+
+
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def observe(self, seconds: float):
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+    def stats(self) -> dict:
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'avg_wait': self.total_wait / self.checkouts if self.checkouts else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который учитывает время получения соединения и таймауты"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_wait_stats.timeouts += 1
+            raise
+        finally:
+            pool_wait_stats.observe(time.perf_counter() - started)
 
 
+def _engine_options() -> dict:
+    options = {
+        'echo': settings.DB_ECHO,
+        'poolclass': TimedQueuePool,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+    }
+    if make_url(settings.DATABASE_URL).get_driver_name() == 'asyncpg':
+        options['connect_args'] = {'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE}
+    return options
 
-engine = create_async_engine(settings.DATABASE_URL,echo=True)
+
+engine = create_async_engine(settings.DATABASE_URL, **_engine_options())
 
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
-class Base(DeclarativeBase):
-    pass
+# время выполнения SQL-запросов; отметка хранится в контексте выполнения конкретного запроса
+@event.listens_for(engine.sync_engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is not None:
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+        db_query_duration_seconds.observe(time.perf_counter() - started, operation)
 
 
+# встроенные lower() и LIKE в SQLite меняют регистр только латиницы; чтобы поиск по каталогу
+# (icontains -> lower(...) LIKE lower(...)) находил кириллические названия, на каждом
+# соединении SQLite движка приложения lower() заменяется на str.casefold, как в normalize_keyword.
+# Обработчик подключен только к этому движку; для другого его подключают явно:
+# event.listen(other_engine.sync_engine, 'connect', sqlite_unicode_lower)
+@event.listens_for(engine.sync_engine, 'connect')
+def sqlite_unicode_lower(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, 'create_function'):
+        dbapi_connection.create_function(
+            'lower', 1, lambda value: value.casefold() if isinstance(value, str) else value, deterministic=True,
+        )
 
 
+def get_pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        **pool_wait_stats.stats(),
+    }
+
+
+class Base(DeclarativeBase):
+    pass
@@ -92,4 +92,46 @@ ExternalAPIException = HTTPException(
 InvalidKinopoiskIDException = HTTPException( 
     status_code=status.HTTP_400_BAD_REQUEST, 
     detail='Неверный Kinopoisk ID', 
-)
\ No newline at end of file
+) 
+
+UpstreamRateLimitException = HTTPException( 
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
+    detail='Превышен лимит запросов к API Кинопоиска, повторите попытку позже', 
+    headers={'Retry-After': '1'}, 
+) 
+
+ExternalAPIUnavailableException = HTTPException( 
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
+    detail='API Кинопоиска временно недоступен, повторите попытку позже', 
+) 
+
+PasswordHashBusyException = HTTPException( 
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
+    detail='Сервер перегружен, повторите попытку позже', 
+    headers={'Retry-After': '1'}, 
+) 
+
+TooManyIdsException = HTTPException( 
+    status_code=status.HTTP_400_BAD_REQUEST, 
+    detail='Слишком много id в одном запросе', 
+) 
+
+InvalidFieldsException = HTTPException( 
+    status_code=status.HTTP_400_BAD_REQUEST, 
+    detail='Неизвестное поле в параметре fields', 
+)
+
+
+
+def upstream_status_exception(upstream_status: int) -> HTTPException:
+    """
+    Ошибка для клиента по статусу ответа API Кинопоиска
+
+    Статусы API наружу не передаются: 401 и 402 относятся к нашим ключам, а не к клиенту.
+    404 - фильм не найден, исчерпанная квота или лимит запросов - 503, остальное - 502
+    """
+    if upstream_status == status.HTTP_404_NOT_FOUND:
+        return FilmNotFoundException
+    if upstream_status in (status.HTTP_402_PAYMENT_REQUIRED, status.HTTP_429_TOO_MANY_REQUESTS):
+        return UpstreamRateLimitException
+    return ExternalAPIException
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import time
+import unicodedata
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+
+import aiohttp
+
+from app.cache import Payload, TTLCache
+from app.config import settings
+from app.kinopoisk.keys import ApiKeyPool
+from app.kinopoisk.limiter import Priority, RateLimitExceeded, TokenBucketLimiter
+from app.kinopoisk.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, backoff_delay
+from app.kinopoisk.singleflight import SingleFlight
+from app.logger import logger
+from app.monitoring.metrics import upstream_request_duration_seconds
+
+
+FILM_DETAILS_URL = settings.KINOPOISK_BASE_URL.rstrip('/') + '/api/v2.2/films/{id}'
+SEARCH_URL = settings.KINOPOISK_BASE_URL.rstrip('/') + '/api/v2.1/films/search-by-keyword?keyword={keyword}'
+
+
+class KinopoiskStatusError(Exception):
+    """Внешний API ответил статусом, отличным от 200"""
+
+    def __init__(self, status: int):
+        super().__init__(f'Kinopoisk API ответил статусом {status}')
+        self.status = status
+
+
+film_details_cache = TTLCache(
+    max_entries=settings.FILM_CACHE_MAX_ENTRIES,
+    max_bytes=settings.FILM_CACHE_MAX_BYTES,
+    ttl=settings.FILM_CACHE_TTL,
+    stale_ttl=settings.FILM_CACHE_STALE_TTL,
+)
+
+# ключ - нормализованный запрос; пустые результаты хранятся с отдельным (коротким) TTL
+search_cache = TTLCache(
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+    ttl=settings.SEARCH_CACHE_TTL,
+)
+
+# одновременные запросы одного и того же ресурса ждут один общий вызов API
+film_details_flight = SingleFlight()
+search_flight = SingleFlight()
+
+api_key_pool = ApiKeyPool(
+    keys=settings.api_keys,
+    daily_quota=settings.KINOPOISK_KEY_DAILY_QUOTA,
+    unauthorized_cooldown=settings.KINOPOISK_KEY_UNAUTHORIZED_COOLDOWN,
+)
+
+# общий лимит исходящих запросов: квота одного ключа, умноженная на число ключей
+kinopoisk_limiter = TokenBucketLimiter(
+    rate=settings.KINOPOISK_RATE_LIMIT * len(api_key_pool),
+    burst=settings.KINOPOISK_RATE_BURST * len(api_key_pool),
+    max_queue=settings.KINOPOISK_RATE_MAX_QUEUE,
+    max_wait=settings.KINOPOISK_RATE_MAX_WAIT,
+)
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.KINOPOISK_BREAKER_FAILURES,
+    reset_timeout=settings.KINOPOISK_BREAKER_RESET_TIMEOUT,
+)
+
+upstream_latency = LatencyTracker(window=1000, min_samples=settings.KINOPOISK_HEDGE_MIN_SAMPLES)
+hedged_requests = 0
+
+
+# фоновые обновления устаревших записей (ссылки держим, чтобы задачи не собрал GC)
+_refresh_tasks: dict[int, asyncio.Task] = {}
+
+
+class UpstreamThrottled(RateLimitExceeded):
+    """API Кинопоиска ответил 429 для использованного ключа"""
+
+
+def get_headers(api_key: str) -> dict:
+    return {
+        'X-API-KEY': api_key,
+        'Content-Type': 'application/json'
+    }
+
+
+def _parse_retry_after(value: str | None) -> float:
+    if not value:
+        return settings.KINOPOISK_RETRY_AFTER_DEFAULT
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return settings.KINOPOISK_RETRY_AFTER_DEFAULT
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _request_timeout(deadline: float) -> aiohttp.ClientTimeout:
+    # общий таймаут попытки не выходит за дедлайн всего запроса с повторами
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise asyncio.TimeoutError('Истек дедлайн запроса к API Кинопоиска')
+    return aiohttp.ClientTimeout(
+        total=min(settings.KINOPOISK_TOTAL_TIMEOUT, remaining),
+        sock_connect=settings.KINOPOISK_CONNECT_TIMEOUT,
+        sock_read=settings.KINOPOISK_READ_TIMEOUT,
+    )
+
+
+async def _request(session: aiohttp.ClientSession, url: str, endpoint: str, deadline: float) -> bytes:
+    timeout = _request_timeout(deadline)
+    key = api_key_pool.acquire()
+    status = None
+    retry_after = 0.0
+    outcome = 'error'
+    started = time.monotonic()
+    try:
+        async with session.get(url, headers=get_headers(key.value), timeout=timeout) as response:
+            status = response.status
+            if status == 429:
+                retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                logger.warning(f'API Кинопоиска ограничил запросы ключа {key.label} (429), пауза {retry_after} с')
+                raise UpstreamThrottled('API Кинопоиска ответил 429')
+            if status != 200:
+                raise KinopoiskStatusError(status)
+            body = await response.read()
+    except asyncio.CancelledError:
+        # проигравший hedged-запрос или отмена клиентом
+        outcome = 'cancelled'
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        upstream_request_duration_seconds.observe(elapsed, endpoint, str(status) if status else outcome)
+        api_key_pool.release(key, status, retry_after)
+        if status == 429 and not api_key_pool.has_available():
+            kinopoisk_limiter.penalize(retry_after)
+    upstream_latency.observe(elapsed)
+    return body
+
+
+async def _attempt(session: aiohttp.ClientSession, url: str, endpoint: str, priority: Priority,
+                   deadline: float) -> bytes:
+    """
+    Одна попытка запроса к API Кинопоиска
+
+    Ожидание токена лимитера и сам запрос ограничены оставшимся до deadline временем.
+    Если включены hedged-запросы и ответ не пришел за наблюдаемый p95, отправляется
+    второй такой же запрос (только при свободном токене лимитера); используется
+    первый успешный ответ, оставшийся запрос отменяется
+    """
+    global hedged_requests
+
+    await kinopoisk_limiter.acquire(priority, timeout=deadline - time.monotonic())
+    tasks = [asyncio.ensure_future(_request(session, url, endpoint, deadline))]
+    try:
+        hedge_after = None
+        if settings.KINOPOISK_HEDGE_ENABLED:
+            hedge_after = upstream_latency.percentile(settings.KINOPOISK_HEDGE_PERCENTILE)
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done and kinopoisk_limiter.try_acquire():
+                hedged_requests += 1
+                tasks.append(asyncio.ensure_future(_request(session, url, endpoint, deadline)))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return tasks[0].result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def _get(session: aiohttp.ClientSession, url: str, endpoint: str, priority: Priority) -> bytes:
+    """
+    GET к API Кинопоиска; возвращает тело ответа со статусом 200
+
+    Запрос проходит через общий лимитер и автоматический выключатель, сетевые ошибки,
+    таймауты и ответы 5xx повторяются с джиттером не более KINOPOISK_RETRIES раз;
+    KINOPOISK_DEADLINE ограничивает весь вызов, включая ожидание лимитера и текущую
+    попытку. Ключ, получивший 401, 402 или 429, охлаждается,
+    и запрос сразу повторяется с другим ключом. Если доступных ключей не осталось,
+    429 приостанавливает лимитер на время из Retry-After и превращается в
+    RateLimitExceeded, остальные статусы, отличные от 200, - в KinopoiskStatusError
+    """
+    deadline = time.monotonic() + settings.KINOPOISK_DEADLINE
+    attempt = 0
+    error = None
+    while True:
+        if time.monotonic() >= deadline:
+            raise error or asyncio.TimeoutError('Истек дедлайн запроса к API Кинопоиска')
+        circuit_breaker.allow()
+        try:
+            body = await _attempt(session, url, endpoint, priority, deadline)
+        except KinopoiskStatusError as e:
+            if e.status < 500:
+                circuit_breaker.record_success()
+                # 401/402 относятся к ключу: он уже охлаждается, пробуем другой
+                if e.status in (401, 402) and api_key_pool.has_available() and attempt < settings.KINOPOISK_RETRIES:
+                    attempt += 1
+                    continue
+                raise
+            circuit_breaker.record_failure()
+            error = e
+        except UpstreamThrottled:
+            circuit_breaker.release()
+            if api_key_pool.has_available() and attempt < settings.KINOPOISK_RETRIES:
+                attempt += 1
+                continue
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            circuit_breaker.record_failure()
+            error = e
+        except BaseException:
+            # переполненная очередь лимитера, отсутствие ключей или отмена не говорят о состоянии API
+            circuit_breaker.release()
+            raise
+        else:
+            circuit_breaker.record_success()
+            return body
+
+        delay = backoff_delay(attempt, settings.KINOPOISK_RETRY_BACKOFF, settings.KINOPOISK_RETRY_BACKOFF_MAX)
+        attempt += 1
+        if attempt > settings.KINOPOISK_RETRIES or time.monotonic() + delay >= deadline:
+            raise error
+        logger.warning(f'Повтор запроса к API Кинопоиска ({attempt}/{settings.KINOPOISK_RETRIES}): {error!r}')
+        await asyncio.sleep(delay)
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    if isinstance(error, KinopoiskStatusError):
+        return error.status >= 500
+    return isinstance(error, (CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def is_film_details(body: bytes) -> bool:
+    """Дешевая проверка тела ответа с деталями фильма без разбора JSON"""
+    return body[:1] == b'{' and b'"kinopoiskId"' in body
+
+
+async def _fetch_film_details(session: aiohttp.ClientSession, film_id: int, priority: Priority) -> Payload:
+    payload = Payload(await _get(session, FILM_DETAILS_URL.format(id=film_id), 'film_details', priority))
+
+    if is_film_details(payload.body):
+        film_details_cache.set(film_id, payload, len(payload))
+    return payload
+
+
+async def refresh_film_details(session: aiohttp.ClientSession, film_id: int) -> Payload:
+    """Запрашивает детали фильма у API с фоновым приоритетом и обновляет запись кеша"""
+    return await film_details_flight.do(
+        film_id, lambda: _fetch_film_details(session, film_id, Priority.BACKGROUND)
+    )
+
+
+async def _refresh_film_details(session: aiohttp.ClientSession, film_id: int):
+    try:
+        await refresh_film_details(session, film_id)
+    except Exception as e:
+        logger.warning(f'Не удалось обновить кеш деталей фильма {film_id}: {str(e)}')
+    finally:
+        _refresh_tasks.pop(film_id, None)
+
+
+def _schedule_refresh(session: aiohttp.ClientSession, film_id: int):
+    if film_id in _refresh_tasks:
+        return
+    _refresh_tasks[film_id] = asyncio.create_task(_refresh_film_details(session, film_id))
+
+
+async def get_film_details_payload(session: aiohttp.ClientSession, film_id: int,
+                                   priority: Priority = Priority.INTERACTIVE) -> Payload:
+    """
+    Тело ответа API Кинопоиска с деталями фильма (JSON в байтах) и его ETag из кеша или из API
+
+    В кеше хранятся байты ответа как есть, поэтому их можно отдать клиенту без разбора
+    и повторной сериализации. Устаревшая запись отдается сразу, а ее обновление
+    запускается в фоне. Пока API недоступен (разомкнут автомат, сетевые ошибки, 5xx),
+    отдается даже истекшая запись.
+    При ответе API со статусом, отличным от 200, выбрасывается KinopoiskStatusError,
+    при исчерпании лимита исходящих запросов - RateLimitExceeded, при разомкнутом
+    автомате и отсутствии записи в кеше - CircuitOpenError
+    """
+    entry = film_details_cache.get_entry(film_id)
+    if entry is not None:
+        if entry.is_stale:
+            _schedule_refresh(session, film_id)
+        return entry.value
+    try:
+        return await film_details_flight.do(film_id, lambda: _fetch_film_details(session, film_id, priority))
+    except Exception as e:
+        fallback = film_details_cache.peek(film_id)
+        if fallback is None or not is_upstream_failure(e):
+            raise
+        logger.warning(f'API Кинопоиска недоступен, отдаем устаревшие детали фильма {film_id}: {e!r}')
+        return fallback.value
+
+
+async def get_film_details(session: aiohttp.ClientSession, film_id: int,
+                           priority: Priority = Priority.INTERACTIVE):
+    """Детали фильма в виде словаря (см. get_film_details_payload)"""
+    payload = await get_film_details_payload(session, film_id, priority)
+    return json.loads(payload.body)
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Приводит поисковый запрос к каноническому виду: NFKC, регистр, пробелы"""
+    return ' '.join(unicodedata.normalize('NFKC', keyword).casefold().split())
+
+
+class UnexpectedSearchResponse(Exception):
+    """Ответ поиска API Кинопоиска не содержит списка films"""
+
+
+async def _fetch_search(session: aiohttp.ClientSession, key: str, priority: Priority) -> Payload:
+    body = await _get(session, SEARCH_URL.format(keyword=quote(key)), 'search', priority)
+
+    # ответ разбирается один раз при обращении к API; в кеш попадает уже готовый JSON списка films
+    result = json.loads(body)
+    if not (isinstance(result, dict) and isinstance(result.get('films'), list)):
+        raise UnexpectedSearchResponse(f'Непредвиденный формат ответа поиска: {body[:200]!r}')
+    films = Payload(json.dumps(result['films'], ensure_ascii=False).encode())
+    ttl = settings.SEARCH_CACHE_TTL if result['films'] else settings.SEARCH_CACHE_EMPTY_TTL
+    search_cache.set(key, films, len(films), ttl=ttl)
+    return films
+
+
+async def search_films(session: aiohttp.ClientSession, keyword: str,
+                       priority: Priority = Priority.INTERACTIVE) -> Payload:
+    """
+    Список найденных по ключевому слову фильмов (JSON-массив в байтах с ETag) из кеша или из API Кинопоиска
+
+    Запрос нормализуется, поэтому "Матрица", " матрица " и "МАТРИЦА" делят одну
+    запись кеша. В кеше хранится готовый JSON, который отдается клиенту без разбора.
+    Пустые результаты тоже кешируются (на SEARCH_CACHE_EMPTY_TTL), чтобы повторные
+    запросы с опечатками не уходили во внешний API. Пока API недоступен, отдается
+    даже истекшая запись.
+    При ответе API со статусом, отличным от 200, выбрасывается KinopoiskStatusError,
+    при ответе без списка films - UnexpectedSearchResponse, при исчерпании лимита
+    исходящих запросов - RateLimitExceeded, при разомкнутом автомате и отсутствии
+    записи в кеше - CircuitOpenError
+    """
+    key = normalize_keyword(keyword)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        return await search_flight.do(key, lambda: _fetch_search(session, key, priority))
+    except Exception as e:
+        fallback = search_cache.peek(key)
+        if fallback is None or not is_upstream_failure(e):
+            raise
+        logger.warning(f"API Кинопоиска недоступен, отдаем устаревший результат поиска '{key}': {e!r}")
+        return fallback.value
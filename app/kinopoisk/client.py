@@ -0,0 +1,47 @@
+import asyncio
+
+import aiohttp
+
+from app.config import settings
+
+
+class KinopoiskClient:
+    """
+    Общий HTTP-клиент для API Кинопоиска на время жизни приложения
+
+    Сессия создается один раз при старте (lifespan) и переиспользует
+    keep-alive соединения, поэтому запросы не платят за TCP/TLS-рукопожатие
+    и DNS-запрос каждый раз
+    """
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=settings.KINOPOISK_POOL_LIMIT,
+            limit_per_host=settings.KINOPOISK_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=settings.KINOPOISK_DNS_TTL,
+            keepalive_timeout=settings.KINOPOISK_KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True,
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self._session is None:
+            return
+        await self._session.close()
+        self._session = None
+        # даем SSL-соединениям корректно закрыться до остановки цикла событий
+        await asyncio.sleep(0.25)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError('HTTP-клиент Кинопоиска не запущен')
+        return self._session
+
+
+kinopoisk_client = KinopoiskClient()
@@ -0,0 +1,116 @@
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from app.kinopoisk.limiter import RateLimitExceeded
+
+
+class NoApiKeyAvailable(RateLimitExceeded):
+    """У всех ключей API исчерпана квота или идет охлаждение"""
+
+
+def _seconds_until_utc_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+
+class ApiKey:
+    def __init__(self, value: str, daily_quota: int, label: str):
+        self.value = value
+        # обозначение ключа для логов и статистики: даже часть значения ключа наружу не отдается
+        self.label = label
+        self.daily_quota = daily_quota
+        self.used_today = 0
+        self.day = datetime.now(timezone.utc).date()
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.statuses: Counter = Counter()
+
+    @property
+    def remaining(self) -> int:
+        self._roll_day()
+        return max(self.daily_quota - self.used_today, 0)
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.cooldown_until and self.remaining > 0
+
+    def _roll_day(self):
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+
+class ApiKeyPool:
+    """
+    Пул ключей API Кинопоиска с учетом квоты по каждому ключу
+
+    Для каждого запроса выбирается доступный ключ с наибольшим остатком дневной
+    квоты (при равенстве - с наименьшим числом выполняющихся запросов), поэтому
+    нагрузка распределяется по всем ключам. Ключ, получивший 401, 402 или 429,
+    временно исключается из выбора
+    """
+
+    def __init__(self, keys: list[str], daily_quota: int, unauthorized_cooldown: float):
+        self.keys = [ApiKey(value, daily_quota, f'key-{number}') for number, value in enumerate(keys, start=1)]
+        self.unauthorized_cooldown = unauthorized_cooldown
+
+    def __len__(self):
+        return len(self.keys)
+
+    def has_available(self) -> bool:
+        now = time.monotonic()
+        return any(key.is_available(now) for key in self.keys)
+
+    def remaining_share(self) -> float:
+        """Доля общей дневной квоты, оставшаяся у ключей без охлаждения"""
+        now = time.monotonic()
+        total = sum(key.daily_quota for key in self.keys)
+        left = sum(key.remaining for key in self.keys if now >= key.cooldown_until)
+        return left / total if total else 0.0
+
+    def acquire(self) -> ApiKey:
+        now = time.monotonic()
+        candidates = [key for key in self.keys if key.is_available(now)]
+        if not candidates:
+            raise NoApiKeyAvailable('Нет доступных ключей API Кинопоиска')
+        key = max(candidates, key=lambda k: (k.remaining, -k.in_flight))
+        key.used_today += 1
+        key.requests += 1
+        key.in_flight += 1
+        return key
+
+    def release(self, key: ApiKey, status: int | None = None, retry_after: float = 0):
+        key.in_flight -= 1
+        if status is None:
+            return
+        key.statuses[status] += 1
+        if status == 401:
+            self._cool_down(key, self.unauthorized_cooldown)
+        elif status == 402:
+            # квота ключа исчерпана до конца суток по UTC
+            key.used_today = key.daily_quota
+            self._cool_down(key, _seconds_until_utc_midnight())
+        elif status == 429:
+            self._cool_down(key, retry_after)
+
+    def _cool_down(self, key: ApiKey, seconds: float):
+        key.cooldown_until = max(key.cooldown_until, time.monotonic() + seconds)
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                'key': key.label,
+                'remaining': key.remaining,
+                'used_today': key.used_today,
+                'daily_quota': key.daily_quota,
+                'in_flight': key.in_flight,
+                'requests': key.requests,
+                'cooldown_for': max(key.cooldown_until - now, 0.0),
+                'statuses': dict(key.statuses),
+            }
+            for key in self.keys
+        ]
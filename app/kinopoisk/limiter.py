@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    """Классы приоритета исходящих запросов: чем меньше значение, тем раньше"""
+
+    INTERACTIVE = 0
+    BULK = 1
+    BACKGROUND = 2
+
+
+class RateLimitExceeded(Exception):
+    """Очередь ожидания переполнена или время ожидания токена истекло"""
+
+
+class TokenBucketLimiter:
+    """
+    Асинхронный token bucket перед всеми запросами к API Кинопоиска
+
+    Токены пополняются со скоростью rate в секунду до burst. Если токена нет,
+    вызывающий встает в ограниченную очередь; очередь разбирается по приоритету,
+    внутри приоритета - в порядке поступления. Если очередь заполнена, более
+    приоритетный вызов вытесняет из нее менее приоритетный. После ответа 429 penalize()
+    останавливает выдачу токенов на время из Retry-After
+    """
+
+    def __init__(self, rate: float, burst: int, max_queue: int, max_wait: float):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self.acquired = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _can_take(self, now: float) -> bool:
+        return now >= self._blocked_until and self._tokens >= 1
+
+    def try_acquire(self) -> bool:
+        """Забирает токен без ожидания, если он есть и очередь пуста"""
+        now = time.monotonic()
+        self._refill(now)
+        if self._waiters or not self._can_take(now):
+            return False
+        self._tokens -= 1
+        self.acquired += 1
+        return True
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE, timeout: float | None = None):
+        # timeout сокращает max_wait, например до оставшегося дедлайна вызывающего
+        max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        if self.try_acquire():
+            return
+        if max_wait <= 0:
+            self.timeouts += 1
+            raise RateLimitExceeded('Истекло время ожидания лимита запросов к API Кинопоиска')
+        if self.queue_depth >= self.max_queue and not self._evict_lower(priority):
+            self.rejected += 1
+            raise RateLimitExceeded('Очередь запросов к API Кинопоиска переполнена')
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, max_wait)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise RateLimitExceeded('Истекло время ожидания лимита запросов к API Кинопоиска')
+        finally:
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            self.max_observed_wait = max(self.max_observed_wait, waited)
+
+    def _evict_lower(self, priority: Priority) -> bool:
+        # в переполненной очереди место уступает последний пришедший ожидающий
+        # с самым низким приоритетом, если он ниже приоритета нового вызова
+        waiting = [entry for entry in self._waiters if not entry[-1].done()]
+        if not waiting:
+            return False
+        victim = max(waiting, key=lambda entry: entry[:2])
+        if victim[0] <= priority:
+            return False
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        self.rejected += 1
+        victim[-1].set_exception(RateLimitExceeded('Запрос вытеснен из очереди более приоритетным'))
+        return True
+
+    def penalize(self, retry_after: float):
+        """Приостанавливает выдачу токенов после ответа 429"""
+        now = time.monotonic()
+        self.throttled += 1
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+        self._tokens = 0.0
+        self._updated = now
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters and self._can_take(now):
+            *_, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._tokens -= 1
+            self.acquired += 1
+            future.set_result(None)
+        while self._waiters and self._waiters[0][-1].done():
+            heapq.heappop(self._waiters)
+        if self._waiters:
+            delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0.001)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'queue_depth': self.queue_depth,
+            'acquired': self.acquired,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'throttled': self.throttled,
+            'blocked_for': max(self._blocked_until - now, 0.0),
+            'avg_wait': self.total_wait / self.queued if self.queued else 0.0,
+            'max_wait': self.max_observed_wait,
+        }
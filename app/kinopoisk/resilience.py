@@ -0,0 +1,92 @@
+import random
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Автомат разомкнут: внешний API считается недоступным, запрос не отправляется"""
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для вызовов внешнего API
+
+    После failure_threshold подряд неудачных вызовов размыкается и reset_timeout
+    секунд отклоняет запросы без обращения к API. Затем пропускает один пробный
+    запрос (half-open): успех замыкает автомат, неудача снова размыкает его
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self):
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError('API Кинопоиска временно недоступен')
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Вызов завершился без сведений о состоянии API (отмена, 429)"""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Скользящее окно последних длительностей вызовов для оценки перцентилей"""
+
+    def __init__(self, window: int, min_samples: int):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(int(len(ordered) * q / 100), len(ordered) - 1)
+        return ordered[index]
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка перед повтором с полным джиттером"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,46 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов к внешнему API
+
+    Пока выполняется вызов по ключу, остальные вызывающие с тем же ключом не
+    запускают свой запрос, а ждут общую задачу и получают тот же результат или
+    то же исключение. Ожидание идет через asyncio.shield, поэтому отмена одного
+    из ожидающих (например, клиент закрыл соединение) не отменяет общий запрос
+    для остальных
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self.started = 0
+        self.joined = 0
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    async def do(self, key, func):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.started += 1
+        else:
+            self.joined += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # помечаем исключение полученным, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._calls),
+            'started': self.started,
+            'joined': self.joined,
+        }
@@ -1,5 +1,10 @@
+import atexit
 import logging
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from pythonjsonlogger import jsonlogger
 
 from app.config import settings
@@ -12,17 +17,64 @@ class CustomJsonFormatter(jsonlogger.JsonFormatter):
     def add_fields(self, log_record, record, message_dict):
         super(CustomJsonFormatter, self).add_fields(log_record, record, message_dict)
         if not log_record.get('timestamp'):
-            # this doesn't use record.created, so it is slightly off
-            now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            # время создания записи, а не время ее вывода фоновым потоком
+            now = datetime.fromtimestamp(record.created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
             log_record['timestamp'] = now
         if log_record.get('level'):
             log_record['level'] = log_record['level'].upper()
         else:
             log_record['level'] = record.levelname
 
+
+class WarningSampler(logging.Filter):
+    """
+    Ограничивает число повторяющихся предупреждений
+
+    Предупреждения из одного места вызова (модуль и строка) пропускаются не чаще
+    limit раз за window секунд, остальные отбрасываются. Первая запись следующего
+    окна получает поле suppressed с числом отброшенных. Ошибки не ограничиваются
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._counters: dict = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.WARNING or self.limit <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window_start, passed, suppressed = self._counters.get(key, (now, 0, 0))
+            if now - window_start >= self.window:
+                window_start, passed = now, 0
+            if passed >= self.limit:
+                self._counters[key] = (window_start, passed, suppressed + 1)
+                return False
+            self._counters[key] = (window_start, passed + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
 formatter = CustomJsonFormatter('%(timestamp)s %(level)s %(name)s %(message)s')
 
 
 logHandler.setFormatter(formatter)
-logger.addHandler(logHandler)
-logger.setLevel(settings.LOG_LEVEL)
\ No newline at end of file
+
+# обработчики логгера только кладут запись в очередь, форматирование и запись
+# в поток вывода выполняются в отдельном потоке и не блокируют цикл событий
+log_queue = queue.SimpleQueue()
+queueHandler = QueueHandler(log_queue)
+queueHandler.addFilter(WarningSampler(settings.LOG_WARNING_SAMPLE_LIMIT, settings.LOG_WARNING_SAMPLE_WINDOW))
+
+log_listener = QueueListener(log_queue, logHandler, respect_handler_level=True)
+log_listener.start()
+# при остановке процесса дописываем оставшиеся в очереди записи
+atexit.register(log_listener.stop)
+
+logger.addHandler(queueHandler)
+logger.setLevel(settings.LOG_LEVEL)
@@ -1,14 +1,40 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from app.logger import logger
+from app.config import settings
+from app.kinopoisk.client import kinopoisk_client
+from app.movies.refresher import refresh_scheduler
 from app.users.router import router as router_users
 from app.movies.router import router as router_movie
 from app.movies.favorites.router import router as router_favorites
+from app.compression import CompressionMiddleware
+from app.monitoring.middleware import MetricsMiddleware
+from app.monitoring.router import router as router_monitoring, metrics_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await kinopoisk_client.start()
+    if settings.REFRESH_ENABLED:
+        refresh_scheduler.start()
+    yield
+    await refresh_scheduler.stop()
+    await kinopoisk_client.close()
+
 
+# JSON-ответы по умолчанию сериализуются через orjson
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-app = FastAPI()
+# сжатие внутри MetricsMiddleware, чтобы его время входило в длительность запроса
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(router_users)
 app.include_router(router_movie)
-app.include_router(router_favorites)
\ No newline at end of file
+app.include_router(router_favorites)
+app.include_router(router_monitoring)
+app.include_router(metrics_router)
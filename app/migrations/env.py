@@ -13,7 +13,7 @@ sys.path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 from app.config import settings
 from app.database import Base
 from app.users.models import Users
-from app.movies.models import Films
+from app.movies.models import Catalog, Favorites
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,57 @@
+"""Unique favorites and user_name
+
+Revision ID: 3b9d1f6a2c47
+Revises: 72f87dc3a12b
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d1f6a2c47'
+down_revision: Union[str, None] = '72f87dc3a12b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# учетные записи с тем же user_name, что у более ранней записи
+DUPLICATE_USERS = 'EXISTS (SELECT 1 FROM users b WHERE b.user_name = users.user_name AND b.id < users.id)'
+
+
+def _rename_duplicate_user_names() -> None:
+    # гонка проверки и вставки при регистрации могла создать одинаковые user_name;
+    # имя остается у самой ранней учетной записи, остальные получают имя "<имя>#<id>",
+    # чтобы не потерять их избранное
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(f'SELECT id, user_name FROM users WHERE {DUPLICATE_USERS} ORDER BY id')).all()
+    if not duplicates:
+        return
+    logger.warning(
+        'Найдены пользователи с повторяющимися user_name, они переименованы в "<имя>#<id>": %s',
+        ', '.join(f'{user_id} ({user_name})' for user_id, user_name in duplicates),
+    )
+    op.execute(f"UPDATE users SET user_name = user_name || '#' || CAST(id AS VARCHAR) WHERE {DUPLICATE_USERS}")
+
+
+def upgrade() -> None:
+    # дубликаты избранного оставались из-за проверки без фильтра по пользователю
+    op.execute(
+        'DELETE FROM films a USING films b '
+        'WHERE a.user_id = b.user_id AND a.kinopoisk_id = b.kinopoisk_id AND a.id > b.id'
+    )
+    # уникальный ключ (user_id, kinopoisk_id) служит и индексом для выборок по user_id
+    op.create_unique_constraint('uq_films_user_id_kinopoisk_id', 'films', ['user_id', 'kinopoisk_id'])
+    _rename_duplicate_user_names()
+    op.create_unique_constraint('uq_users_user_name', 'users', ['user_name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_users_user_name', 'users', type_='unique')
+    op.drop_constraint('uq_films_user_id_kinopoisk_id', 'films', type_='unique')
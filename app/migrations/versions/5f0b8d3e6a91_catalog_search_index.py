@@ -0,0 +1,38 @@
+"""Catalog full-text search index
+
+Revision ID: 5f0b8d3e6a91
+Revises: c41f7a9e2b53
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0b8d3e6a91'
+down_revision: Union[str, None] = 'c41f7a9e2b53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# выражение должно совпадать с catalog_search_vector() в app/movies/models.py
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian'::regconfig, film_name), 'A') || "
+    "setweight(to_tsvector('russian'::regconfig, description), 'B')"
+)
+
+
+def upgrade() -> None:
+    # на других СУБД поиск по каталогу выполняется через ILIKE без индекса
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.create_index('ix_catalog_search', 'catalog', [sa.text(f'({SEARCH_VECTOR})')], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_catalog_search', table_name='catalog')
@@ -0,0 +1,27 @@
+"""Favorites keyset index
+
+Revision ID: 8e2a4c5d7f10
+Revises: 3b9d1f6a2c47
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2a4c5d7f10'
+down_revision: Union[str, None] = '3b9d1f6a2c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keyset-пагинация: WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?
+    op.create_index('ix_films_user_id_id', 'films', ['user_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_films_user_id_id', table_name='films')
@@ -0,0 +1,30 @@
+"""Catalog updated_at
+
+Revision ID: a7c3e19d4b08
+Revises: 5f0b8d3e6a91
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e19d4b08'
+down_revision: Union[str, None] = '5f0b8d3e6a91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # существующие строки получают время миграции и обновляются по мере старения
+    op.add_column('catalog', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    # фоновое обновление выбирает самые старые строки: ORDER BY updated_at LIMIT ?
+    op.create_index('ix_catalog_updated_at', 'catalog', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_catalog_updated_at', table_name='catalog')
+    op.drop_column('catalog', 'updated_at')
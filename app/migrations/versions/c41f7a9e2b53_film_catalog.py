@@ -0,0 +1,89 @@
+"""Film catalog and favorites link table
+
+Revision ID: c41f7a9e2b53
+Revises: 8e2a4c5d7f10
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a9e2b53'
+down_revision: Union[str, None] = '8e2a4c5d7f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _reset_sequence(table: str) -> None:
+    # после вставки строк с явными id последовательность должна продолжиться с max(id)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+            f"FROM {table}"
+        )
+
+
+def upgrade() -> None:
+    op.create_table('catalog',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('kinopoisk_id', sa.Integer(), nullable=False),
+    sa.Column('film_name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kinopoisk_id', name='uq_catalog_kinopoisk_id')
+    )
+    # из копий фильма у разных пользователей в каталог попадает последняя сохраненная
+    op.execute(
+        'INSERT INTO catalog (kinopoisk_id, film_name, description) '
+        'SELECT kinopoisk_id, film_name, description FROM films '
+        'WHERE id IN (SELECT MAX(id) FROM films GROUP BY kinopoisk_id) '
+        'ORDER BY id'
+    )
+
+    op.create_table('favorites',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('film_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['film_id'], ['catalog.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'film_id', name='uq_favorites_user_id_film_id')
+    )
+    # id записей избранного сохраняются, поэтому выданные курсоры страниц остаются верными
+    op.execute(
+        'INSERT INTO favorites (id, user_id, film_id) '
+        'SELECT films.id, films.user_id, catalog.id FROM films '
+        'JOIN catalog ON catalog.kinopoisk_id = films.kinopoisk_id'
+    )
+    _reset_sequence('favorites')
+    op.create_index('ix_favorites_user_id_id', 'favorites', ['user_id', 'id'])
+
+    op.drop_table('films')
+
+
+def downgrade() -> None:
+    op.create_table('films',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kinopoisk_id', sa.Integer(), nullable=False),
+    sa.Column('film_name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'kinopoisk_id', name='uq_films_user_id_kinopoisk_id')
+    )
+    op.execute(
+        'INSERT INTO films (id, user_id, kinopoisk_id, film_name, description) '
+        'SELECT favorites.id, favorites.user_id, catalog.kinopoisk_id, catalog.film_name, catalog.description '
+        'FROM favorites JOIN catalog ON catalog.id = favorites.film_id'
+    )
+    _reset_sequence('films')
+    op.create_index('ix_films_user_id_id', 'films', ['user_id', 'id'])
+
+    op.drop_index('ix_favorites_user_id_id', table_name='favorites')
+    op.drop_table('favorites')
+    op.drop_table('catalog')
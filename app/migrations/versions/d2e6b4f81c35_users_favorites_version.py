@@ -0,0 +1,27 @@
+"""Users favorites_version
+
+Revision ID: d2e6b4f81c35
+Revises: a7c3e19d4b08
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e6b4f81c35'
+down_revision: Union[str, None] = 'a7c3e19d4b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # версия списка избранного для ETag; у существующих пользователей начинается с 0
+    op.add_column('users', sa.Column('favorites_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'favorites_version')
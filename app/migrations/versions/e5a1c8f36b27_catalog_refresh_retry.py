@@ -0,0 +1,29 @@
+"""Catalog refresh retry
+
+Revision ID: e5a1c8f36b27
+Revises: d2e6b4f81c35
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c8f36b27'
+down_revision: Union[str, None] = 'd2e6b4f81c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # счетчик неудачных фоновых обновлений и время следующей попытки
+    op.add_column('catalog', sa.Column('refresh_failures', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('catalog', sa.Column('refresh_retry_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('catalog', 'refresh_retry_at')
+    op.drop_column('catalog', 'refresh_failures')
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self._values.items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus
+
+    observe() стоит одного бинарного поиска по границам и нескольких обращений
+    к словарю, поэтому ее можно держать включенной на горячем пути
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: dict = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for label_values, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f'{self.name}_bucket', _format_labels(self.labels, label_values, le), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labels, label_values), total
+            yield f'{self.name}_count', _format_labels(self.labels, label_values), count
+
+
+class CallbackGauge:
+    """Gauge, значения которого вычисляются при каждом чтении /metrics"""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: tuple, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.callback = callback
+
+    def samples(self):
+        for label_values, value in self.callback():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class CallbackCounter(CallbackGauge):
+    """Счетчик, который ведет сам объект (например, кеш), а /metrics только читает; значения не убывают"""
+
+    type = 'counter'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    'http_requests_total', 'Число HTTP-запросов по маршруту и статусу', ('method', 'route', 'status'),
+))
+http_request_duration_seconds = registry.register(Histogram(
+    'http_request_duration_seconds', 'Длительность обработки HTTP-запроса', ('method', 'route'),
+))
+upstream_request_duration_seconds = registry.register(Histogram(
+    'kinopoisk_request_duration_seconds', 'Длительность запроса к API Кинопоиска', ('endpoint', 'status'),
+))
+db_query_duration_seconds = registry.register(Histogram(
+    'db_query_duration_seconds', 'Длительность SQL-запроса', ('operation',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+))
@@ -0,0 +1,38 @@
+import time
+
+from app.monitoring.metrics import http_request_duration_seconds, http_requests_total
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware, которое пишет длительность и статус каждого HTTP-запроса
+
+    Маршрут берется из шаблона пути (например, /movies/{id}), а не из фактического
+    URL, чтобы число временных рядов не росло с числом разных id
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            path = getattr(route, 'path', 'unmatched')
+            method = scope['method']
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, path)
+            http_requests_total.inc(method, path, str(status_code))
@@ -0,0 +1,188 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.cache import encoded_cache
+from app.database import get_pool_stats
+from app.kinopoisk.api import film_details_cache, search_cache, film_details_flight, search_flight
+from app.kinopoisk import api as kinopoisk_api
+from app.kinopoisk.api import kinopoisk_limiter, circuit_breaker, upstream_latency, api_key_pool
+from app.monitoring.metrics import CallbackCounter, CallbackGauge, registry
+from app.movies.refresher import refresh_scheduler
+from app.users.cache import user_cache, token_cache
+from app.users.dependencies import get_current_user
+
+
+
+# подробная статистика доступна только аутентифицированным пользователям
+router = APIRouter(
+    prefix="/monitoring",
+    tags=['Мониторинг'],
+    dependencies=[Depends(get_current_user)],
+    )
+
+# /metrics отдается без префикса и без аутентификации, по адресу, который Prometheus
+# опрашивает по умолчанию; значения ключей API в метрики не попадают
+metrics_router = APIRouter(
+    tags=['Мониторинг']
+    )
+
+
+CACHES = {
+    'film_details': film_details_cache,
+    'search': search_cache,
+    'compressed': encoded_cache,
+    'users': user_cache,
+    'tokens': token_cache,
+}
+
+
+def _cache_samples(field: str):
+    return lambda: [((name, ), cache.stats()[field]) for name, cache in CACHES.items()]
+
+
+for _field in ('entries', 'bytes'):
+    registry.register(CallbackGauge(
+        f'cache_{_field}', f'Значение {_field} in-process кеша', ('cache', ), _cache_samples(_field),
+    ))
+# попадания, промахи и вытеснения только растут, поэтому это счетчики с суффиксом _total
+for _field in ('hits', 'stale_hits', 'misses', 'evictions'):
+    registry.register(CallbackCounter(
+        f'cache_{_field}_total', f'Число событий {_field} in-process кеша', ('cache', ), _cache_samples(_field),
+    ))
+
+registry.register(CallbackGauge(
+    'kinopoisk_rate_limiter_queue_depth', 'Число запросов в очереди лимитера', (),
+    lambda: [((), kinopoisk_limiter.queue_depth)],
+))
+registry.register(CallbackGauge(
+    'kinopoisk_circuit_breaker_open', 'Автомат разомкнут (1) или замкнут (0)', (),
+    lambda: [((), int(circuit_breaker.state != circuit_breaker.CLOSED))],
+))
+registry.register(CallbackGauge(
+    'kinopoisk_api_key_remaining', 'Остаток дневной квоты ключа API', ('key', ),
+    lambda: [((key['key'], ), key['remaining']) for key in api_key_pool.stats()],
+))
+registry.register(CallbackGauge(
+    'film_refresh_due', 'Фильмы, ожидающие фонового обновления', ('source', ),
+    lambda: [(('cache', ), refresh_scheduler.cache_due), (('catalog', ), refresh_scheduler.catalog_due)],
+))
+registry.register(CallbackGauge(
+    'film_refresh_catalog_lag_seconds', 'Возраст самых старых данных каталога, ожидающих обновления', (),
+    lambda: [((), refresh_scheduler.catalog_oldest_age)],
+))
+registry.register(CallbackGauge(
+    'db_pool_connections', 'Соединения пула БД', ('state', ),
+    lambda: [((state, ), value) for state, value in get_pool_stats().items()
+             if state in ('size', 'checked_out', 'checked_in', 'overflow')],
+))
+
+
+
+# статистика кешей
+@router.get("/cache")
+async def get_cache_stats():
+    """ 
+    Эндпоинт для получения статистики in-process кешей
+
+    Возвращает: 
+    - для каждого кеша число записей, объем в байтах, попадания, промахи и вытеснения
+    """
+
+    return {
+        'film_details': film_details_cache.stats(),
+        'search': search_cache.stats(),
+        'compressed': encoded_cache.stats(),
+        'users': user_cache.stats(),
+        'tokens': token_cache.stats(),
+    }
+
+
+
+# состояние обращений к API Кинопоиска
+@router.get("/upstream")
+async def get_upstream_stats():
+    """ 
+    Эндпоинт для получения статистики обращений к API Кинопоиска
+
+    Возвращает: 
+    - число выполняющихся запросов и число вызовов, присоединившихся к уже идущему запросу
+    - глубину очереди лимитера, время ожидания токена и число ответов 429
+    - состояние автоматического выключателя, p50/p95 задержки API и число hedged-запросов
+    """
+
+    return {
+        'rate_limiter': kinopoisk_limiter.stats(),
+        'circuit_breaker': circuit_breaker.stats(),
+        'latency': {
+            'p50': upstream_latency.percentile(50),
+            'p95': upstream_latency.percentile(95),
+        },
+        'hedged_requests': kinopoisk_api.hedged_requests,
+        'single_flight': {
+            'film_details': film_details_flight.stats(),
+            'search': search_flight.stats(),
+        },
+    }
+
+
+
+# фоновое обновление деталей фильмов
+@router.get("/refresh")
+async def get_refresh_stats():
+    """ 
+    Эндпоинт для получения состояния фонового обновления деталей фильмов
+
+    Возвращает: 
+    - число проходов (в том числе пропущенных из-за квоты), обновленных фильмов и ошибок,
+    время последнего и следующего прохода и длительность последнего
+    - отставание: число записей кеша, которые скоро устареют (и уже устарели), число строк
+    каталога старше REFRESH_CATALOG_MAX_AGE и возраст самой старой из них в секундах
+    """
+
+    return refresh_scheduler.stats()
+
+
+
+# использование ключей API
+@router.get("/keys")
+async def get_api_keys_stats():
+    """ 
+    Эндпоинт для получения статистики использования ключей API Кинопоиска
+
+    Возвращает: 
+    - для каждого ключа (по номеру в пуле, без значения ключа) остаток дневной квоты, число запросов,
+    оставшееся время охлаждения и распределение статусов ответов
+    """
+
+    return api_key_pool.stats()
+
+
+
+# состояние пула соединений с БД
+@router.get("/db")
+async def get_db_pool_stats():
+    """ 
+    Эндпоинт для получения статистики пула соединений с БД текущего воркера
+
+    Возвращает: 
+    - размер пула, число выданных и свободных соединений, overflow, число выдач соединений,
+    таймауты и время ожидания соединения (среднее и максимальное)
+    """
+
+    return get_pool_stats()
+
+
+
+# метрики в текстовом формате Prometheus
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """ 
+    Эндпоинт для сбора метрик Prometheus
+
+    Возвращает: 
+    - гистограммы длительности HTTP-запросов по шаблону маршрута, запросов к API Кинопоиска
+    по эндпоинту и статусу и SQL-запросов по типу операции, число ответов по статусам
+    - текущее состояние кешей, лимитера, автоматического выключателя, ключей API и пула БД
+    """
+
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
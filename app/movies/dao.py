@@ -1,19 +1,235 @@
+import re
+from datetime import datetime, timedelta, timezone
+
 from app.dao.base import BaseDAO
-from app.movies.models import Films
+from app.movies.models import Catalog, Favorites, SEARCH_CONFIG, catalog_search_vector
 from app.users.models import Users
+from sqlalchemy import select, delete, update, and_, or_, case, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 
 
-class UsersDAO(BaseDAO): 
+class UsersDAO(BaseDAO):
     model = Users
 
-class FilmsDAO(BaseDAO): 
-    model = Films
+    @classmethod
+    async def get_favorites_version(cls, user_id: int, session: AsyncSession) -> int:
+        query = select(cls.model.favorites_version).where(cls.model.id == user_id)
+        result = await session.execute(query)
+        return result.scalar_one_or_none() or 0
+
+    @classmethod
+    async def bump_favorites_version(cls, session: AsyncSession, user_ids=None, film_ids=None):
+        # без commit: версия меняется в той же транзакции, что и само избранное;
+        # film_ids - все пользователи, у которых в избранном есть эти фильмы каталога
+        query = update(cls.model).values(favorites_version=cls.model.favorites_version + 1)
+        if user_ids is not None:
+            query = query.where(cls.model.id.in_(user_ids))
+        if film_ids is not None:
+            query = query.where(cls.model.id.in_(select(Favorites.user_id).where(Favorites.film_id.in_(film_ids))))
+        await session.execute(query)
+
+
+class CatalogDAO(BaseDAO):
+    model = Catalog
+
+    @classmethod
+    async def get_by_kinopoisk_ids(cls, kinopoisk_ids: list, session: AsyncSession) -> dict:
+        # kinopoisk_id -> строка каталога
+        if not kinopoisk_ids:
+            return {}
+        result = await session.scalars(select(cls.model).where(cls.model.kinopoisk_id.in_(kinopoisk_ids)))
+        return {film.kinopoisk_id: film for film in result.all()}
+
+    @classmethod
+    async def get_ids(cls, kinopoisk_ids: list, session: AsyncSession) -> dict:
+        # kinopoisk_id -> id строки каталога для уже известных фильмов, одним запросом
+        if not kinopoisk_ids:
+            return {}
+        query = select(cls.model.kinopoisk_id, cls.model.id).where(cls.model.kinopoisk_id.in_(kinopoisk_ids))
+        result = await session.execute(query)
+        return dict(result.all())
+
+    @classmethod
+    async def save_many(cls, films: list, session: AsyncSession, commit: bool = True) -> dict:
+        # добавляет фильмы в каталог (существующие строки обновляются, счетчик неудачных
+        # обновлений сбрасывается); kinopoisk_id -> id
+        updated_at = datetime.now(timezone.utc)
+        rows = [{**film, 'updated_at': updated_at, 'refresh_failures': 0, 'refresh_retry_at': None} for film in films]
+        saved = await cls.upsert_many(
+            session, ['kinopoisk_id'], rows,
+            ['film_name', 'description', 'updated_at', 'refresh_failures', 'refresh_retry_at'], commit=commit,
+        )
+        return {film.kinopoisk_id: film.id for film in saved}
+
+    @classmethod
+    async def get_outdated(cls, updated_before: datetime, limit: int, session: AsyncSession) -> list:
+        # kinopoisk_id фильмов с данными старше updated_before, самые старые первыми;
+        # строки, отложенные после неудачного обновления, пропускаются до refresh_retry_at
+        now = datetime.now(timezone.utc)
+        query = (
+            select(cls.model.kinopoisk_id)
+            .where(
+                cls.model.updated_at < updated_before,
+                or_(cls.model.refresh_retry_at.is_(None), cls.model.refresh_retry_at <= now),
+            )
+            .order_by(cls.model.updated_at)
+            .limit(limit)
+        )
+        result = await session.execute(query)
+        return result.scalars().all()
+
+    @classmethod
+    async def mark_refresh_failed(cls, kinopoisk_ids: list, backoff: float, backoff_max: float, session: AsyncSession):
+        # откладывает следующую попытку обновления с экспоненциально растущей паузой
+        now = datetime.now(timezone.utc)
+        for film in (await cls.get_by_kinopoisk_ids(kinopoisk_ids, session)).values():
+            film.refresh_failures += 1
+            film.refresh_retry_at = now + timedelta(seconds=min(backoff_max, backoff * 2 ** (film.refresh_failures - 1)))
+        await session.commit()
+
+    @classmethod
+    async def get_outdated_stats(cls, updated_before: datetime, session: AsyncSession) -> tuple:
+        # число устаревших строк каталога и время обновления самой старой из них
+        query = select(func.count(), func.min(cls.model.updated_at)).where(cls.model.updated_at < updated_before)
+        result = await session.execute(query)
+        return result.one()
+
+    @classmethod
+    async def search(cls, keyword: str, limit: int, session: AsyncSession) -> list:
+        # поиск по названиям и описаниям фильмов каталога; результат в формате
+        # элементов films ответа search-by-keyword Кинопоиска
+        terms = re.findall(r'\w+', keyword)
+        if not terms:
+            return []
+        columns = (cls.model.kinopoisk_id, cls.model.film_name, cls.model.description)
+        if session.bind.dialect.name == 'postgresql':
+            # GIN-индекс ix_catalog_search; каждое слово запроса ищется и как префикс
+            vector = catalog_search_vector()
+            tsquery = func.to_tsquery(text(f"'{SEARCH_CONFIG}'::regconfig"), ' & '.join(f'{term}:*' for term in terms))
+            query = (
+                select(*columns)
+                .where(vector.op('@@')(tsquery))
+                .order_by(func.ts_rank_cd(vector, tsquery).desc(), cls.model.id)
+            )
+        else:
+            # без полнотекстового индекса: все слова должны встретиться в названии или описании,
+            # фильмы с совпадением в названии идут первыми
+            in_name = and_(*(cls.model.film_name.icontains(term, autoescape=True) for term in terms))
+            query = (
+                select(*columns)
+                .where(*(
+                    or_(cls.model.film_name.icontains(term, autoescape=True),
+                        cls.model.description.icontains(term, autoescape=True))
+                    for term in terms
+                ))
+                .order_by(case((in_name, 0), else_=1), cls.model.id)
+            )
+        result = await session.execute(query.limit(limit))
+        return [
+            {'filmId': kinopoisk_id, 'nameRu': film_name, 'description': description}
+            for kinopoisk_id, film_name, description in result.all()
+        ]
+
+
+class FilmsDAO(BaseDAO):
+    model = Favorites
+
+    # поля, которые можно запросить в списке избранного, и их столбцы
+    PAGE_COLUMNS = {
+        'id': Favorites.id,
+        'user_id': Favorites.user_id,
+        'kinopoisk_id': Catalog.kinopoisk_id,
+        'film_name': Catalog.film_name,
+        'description': Catalog.description,
+    }
+    PAGE_FIELDS = list(PAGE_COLUMNS)
+
+    @classmethod
+    async def get_catalog_id(cls, kinopoisk_id: int, session: AsyncSession) -> int | None:
+        # id фильма в каталоге или None, если фильм еще не запрашивался у Кинопоиска
+        ids = await CatalogDAO.get_ids([kinopoisk_id], session)
+        return ids.get(kinopoisk_id)
+
+    @classmethod
+    async def add_favorite(cls, user_id: int, film_id: int, session: AsyncSession) -> bool:
+        # False, если фильм уже есть в избранном пользователя (уникальный ключ user_id, film_id)
+        new_id = await cls.add_if_absent(session, ['user_id', 'film_id'], commit=False, user_id=user_id, film_id=film_id)
+        if new_id is not None:
+            await UsersDAO.bump_favorites_version(session, user_ids=[user_id])
+        await session.commit()
+        return new_id is not None
+
+    @classmethod
+    async def add_movie_to_db(cls, user_id: int, kinopoisk_id: int, film_name: str, description: str, session: AsyncSession) -> bool:
+        # фильм записывается в каталог и добавляется в избранное в одной транзакции
+        film_ids = await CatalogDAO.save_many(
+            [{'kinopoisk_id': kinopoisk_id, 'film_name': film_name, 'description': description}],
+            session, commit=False,
+        )
+        new_id = await cls.add_if_absent(
+            session, ['user_id', 'film_id'], commit=False, user_id=user_id, film_id=film_ids[kinopoisk_id],
+        )
+        if new_id is not None:
+            await UsersDAO.bump_favorites_version(session, user_ids=[user_id])
+        await session.commit()
+        return new_id is not None
+
+    @classmethod
+    async def get_kinopoisk_ids(cls, user_id: int, kinopoisk_ids: list, session: AsyncSession) -> set:
+        # какие из переданных фильмов уже есть в избранном пользователя - одним запросом
+        if not kinopoisk_ids:
+            return set()
+        query = (
+            select(Catalog.kinopoisk_id)
+            .join(cls.model, cls.model.film_id == Catalog.id)
+            .where(cls.model.user_id == user_id, Catalog.kinopoisk_id.in_(kinopoisk_ids))
+        )
+        result = await session.execute(query)
+        return set(result.scalars().all())
+
+    @classmethod
+    async def add_movies_to_db(cls, user_id: int, film_ids: dict, new_films: list, session: AsyncSession) -> set:
+        # new_films записываются в каталог, затем все фильмы (film_ids - уже известные
+        # kinopoisk_id -> id каталога) добавляются в избранное многострочной вставкой;
+        # возвращает kinopoisk_id действительно добавленных фильмов
+        film_ids = {**film_ids, **await CatalogDAO.save_many(new_films, session, commit=False)}
+        rows = [{'user_id': user_id, 'film_id': film_id} for film_id in film_ids.values()]
+        added = await cls.add_many_if_absent(session, ['user_id', 'film_id'], rows, commit=False)
+        if added:
+            await UsersDAO.bump_favorites_version(session, user_ids=[user_id])
+        await session.commit()
+        kinopoisk_ids = {film_id: kinopoisk_id for kinopoisk_id, film_id in film_ids.items()}
+        return {kinopoisk_ids[favorite.film_id] for favorite in added}
+
+    @classmethod
+    async def del_by_id(cls, user_id: int, kinopoisk_id: int, session: AsyncSession, commit: bool = True):
+        # фильм удаляется только из избранного, строка каталога остается для других пользователей
+        film_id = select(Catalog.id).where(Catalog.kinopoisk_id == kinopoisk_id).scalar_subquery()
+        query = delete(cls.model).where(cls.model.user_id == user_id, cls.model.film_id == film_id)
+        result = await session.execute(query)
+        if result.rowcount:
+            await UsersDAO.bump_favorites_version(session, user_ids=[user_id])
+        if commit:
+            await session.commit()
+        return result.rowcount
+
+    @classmethod
+    async def get_page(cls, user_id: int, session: AsyncSession, fields: list, after_id: int | None, limit: int):
+        # keyset-пагинация по favorites.id: читаются только запрошенные столбцы (и id для курсора),
+        # каталог присоединяется, только если запрошены его поля;
+        # лишняя строка сверх limit показывает, что есть следующая страница
+        columns = [cls.PAGE_COLUMNS[field].label(field) for field in fields if field != 'id']
+        query = select(cls.model.id, *columns).where(cls.model.user_id == user_id)
+        if any(cls.PAGE_COLUMNS[field].table is Catalog.__table__ for field in fields):
+            query = query.join(Catalog, cls.model.film_id == Catalog.id)
+        if after_id is not None:
+            query = query.where(cls.model.id > after_id)
+        query = query.order_by(cls.model.id).limit(limit + 1)
+        result = await session.execute(query)
+        rows = result.mappings().all()
 
-    @classmethod 
-    async def add_movie_to_db(cls, user_id: int, kinopoisk_id: int, film_name: str, description: str, session: AsyncSession): 
-        new_movie = cls.model(user_id=user_id, kinopoisk_id=kinopoisk_id, film_name=film_name, description=description) 
-        session.add(new_movie) 
-        await session.commit()       
\ No newline at end of file
+        next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+        page = [{field: row[field] for field in fields} for row in rows[:limit]]
+        return page, next_cursor
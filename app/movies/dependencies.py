@@ -1,6 +1,5 @@
-import aiohttp
-
 from app.database import async_session_maker
+from app.kinopoisk.client import kinopoisk_client
 from app.movies.dao import FilmsDAO
 
 
@@ -9,8 +8,7 @@ async def get_films_dao():
 
 
 async def get_client_session(): 
-    async with aiohttp.ClientSession() as session: 
-        yield session
+    return kinopoisk_client.session
 
 
 async def get_db_session(): 
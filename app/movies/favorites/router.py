@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, Request, Query, HTTPException, Path
+from fastapi import APIRouter, Depends, Request, Response, Query, HTTPException, Path, Body
 from sqlalchemy.ext.asyncio import AsyncSession 
 import aiohttp
+import asyncio
 
 from app.dao.dependencies import get_db_session
-from app.movies.dao import FilmsDAO
+from app.movies.dao import FilmsDAO, CatalogDAO, UsersDAO
+from app.movies.schemas import SBatchResult, SDetail, SFavoriteFilm
 from app.movies.dependencies import FilmsDAO, get_films_dao, get_client_session
-from app.config import settings
+from app.kinopoisk.api import get_film_details, KinopoiskStatusError
+from app.kinopoisk.limiter import Priority, RateLimitExceeded
+from app.kinopoisk.resilience import CircuitOpenError
 from app.users.models import Users
+from app.users.schemas import SMessage
 from app.users.dependencies import get_current_user
 from app.logger import logger
+from app.responses import etag_matches, make_etag, not_modified
 from app.exceptions import NoUserExceptions, FilmNotFoundException, NoMovieIDException, EnternalServerErrorException
-from app.exceptions import NetworkErrorException, UnexpectedResponseFormatException
+from app.exceptions import NetworkErrorException, UnexpectedResponseFormatException, UpstreamRateLimitException
+from app.exceptions import ExternalAPIUnavailableException, TooManyIdsException, InvalidFieldsException
+from app.exceptions import upstream_status_exception
+from app.config import settings
 
 
 
@@ -19,10 +28,14 @@ router = APIRouter(
     tags=['Любимые']
     )
 
+# список может измениться в любой момент, поэтому клиент перепроверяет его каждый раз,
+# но благодаря ETag неизмененный список обходится ответом 304 без тела
+FAVORITES_CACHE_CONTROL = 'private, no-cache'
+
 
 
 #добавление фильма в избранное
-@router.post("/")
+@router.post("/", response_model=SMessage | SDetail)
 async def add_to_favorites(request: Request, 
                            id: int = Query(...), 
                            current_user: Users = Depends(get_current_user),
@@ -39,6 +52,9 @@ async def add_to_favorites(request: Request,
     - films_dao_object: объект для доступа к данным фильмов через FilmsDAO
     - session_client: HTTP-клиент для выполнения запросов к внешним API
     - session_db: асинхронная сессия для взаимодействия с базой данных
+
+    Если фильм уже есть в общем каталоге, внешний API не вызывается; иначе детали фильма
+    запрашиваются у Кинопоиска и фильм записывается в каталог
  
     Возвращает: 
     - сообщение о результате операции (например, успешное добавление фильма в 
@@ -47,8 +63,10 @@ async def add_to_favorites(request: Request,
     Исключения: 
     - NoUserExceptions: вызывается, если текущий пользователь не аутентифицирован
     - FilmNotFoundException: если фильм с указанным идентификатором не найден
-    - HTTPException: если произошла ошибка при обращении к внешнему сервису
+    - ExternalAPIException: если API Кинопоиска ответил ошибкой (кроме 404 и исчерпанной квоты)
     - NetworkErrorException: ошибка сетевого взаимодействия
+    - UpstreamRateLimitException: если превышен лимит запросов или исчерпана квота ключей API Кинопоиска
+    - ExternalAPIUnavailableException: если API Кинопоиска недоступен и в кеше нет данных
     - UnexpectedResponseFormatException: если ответ от внешнего сервиса не соответствует ожидаемому формату 
     - EnternalServerErrorException: любая другая непредвиденная ошибка
     """
@@ -57,66 +75,153 @@ async def add_to_favorites(request: Request,
         logger.warning('Попытка доступа к профилю без аутентификации') 
         raise NoUserExceptions
     
-    api_key = settings.API_key
-    
-    url = f"https://kinopoiskapiunofficial.tech/api/v2.2/films/{id}" 
-    
-    headers = {
-        'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
-    }
-    
     try:
-        is_exists = await films_dao_object.find_one_or_none(session_db, kinopoisk_id=id)
-        if is_exists != None:
-            logger.info(f'Фильм с id {id} уже присутствует в избранном пользователя {current_user.id}') 
-            return {"detail": f"Фильм с id {id} уже присутствует в избранном"}
- 
-        async with session_client.get(url, headers=headers) as response: 
-            if response.status == 404: 
-                logger.error(f"Фильм с ID {id} не найден") 
-                raise FilmNotFoundException
-            
-            if response.status != 200:  
-                logger.error(f"Ошибка при получении данных: {response.status}") 
-                raise HTTPException(status_code=response.status, detail="Ошибка при обращении к внешнему сервису")
-            
-            # Получаем данные о фильме 
-            film_data = await response.json() 
+        # фильм, который уже есть в каталоге, добавляется без обращения к внешнему API
+        film_id = await films_dao_object.get_catalog_id(id, session_db)
+        if film_id is not None:
+            is_added = await films_dao_object.add_favorite(current_user.id, film_id, session_db)
+        else:
+            try:
+                # Получаем данные о фильме (из кеша или из внешнего API)
+                film_data = await get_film_details(session_client, id)
+            except KinopoiskStatusError as e:
+                if e.status == 404: 
+                    logger.error(f"Фильм с ID {id} не найден") 
+                else:
+                    logger.error(f"Ошибка при получении данных: {e.status}") 
+                # статус API Кинопоиска клиенту не передается: 401 и 402 относятся к нашим ключам
+                raise upstream_status_exception(e.status)
 
             # Проверяем структуру ответа 
-            if isinstance(film_data, dict) and 'kinopoiskId' in film_data: 
-                film_info = film_data  
-                
-                # Извлекаем необходимые поля 
-                kinopoisk_id = film_info.get("kinopoiskId") 
-                film_name = film_info.get("nameRu", "") 
-                description = film_info.get("description", "") 
-
-                print(kinopoisk_id)
-                print(film_name)
-                print(description)
-
-                await films_dao_object.add_movie_to_db(current_user.id, kinopoisk_id, film_name, description, session_db)
-
-                return {'message': 'Film added to favorites'} 
-            else:
+            if not (isinstance(film_data, dict) and 'kinopoiskId' in film_data): 
                 logger.error(f"Неожиданный формат ответа: {film_data}")  # Логируем неожиданный ответ 
                 raise UnexpectedResponseFormatException
+
+            # Извлекаем необходимые поля 
+            kinopoisk_id = film_data.get("kinopoiskId") 
+            film_name = film_data.get("nameRu") or ""
+            description = film_data.get("description") or ""
+
+            logger.debug('Добавление в каталог и избранное: kinopoisk_id=%s, название=%s', kinopoisk_id, film_name)
+
+            # каталог и избранное записываются INSERT ... ON CONFLICT в одной транзакции
+            is_added = await films_dao_object.add_movie_to_db(current_user.id, kinopoisk_id, film_name, description, session_db)
+
+        if not is_added:
+            logger.info(f'Фильм с id {id} уже присутствует в избранном пользователя {current_user.id}') 
+            return {"detail": f"Фильм с id {id} уже присутствует в избранном"}
+
+        return {'message': 'Film added to favorites'} 
     
+    except RateLimitExceeded:  # Исчерпан лимит запросов к внешнему API 
+        logger.warning(f"Превышен лимит запросов к API Кинопоиска при добавлении фильма {id}") 
+        raise UpstreamRateLimitException
+    except CircuitOpenError:  # Внешний API недоступен, запрос не отправлялся 
+        logger.warning(f"API Кинопоиска недоступен при добавлении фильма {id}") 
+        raise ExternalAPIUnavailableException
     except aiohttp.ClientError as e:  # Обработка сетевых ошибок 
         logger.error(f"Сетевая ошибка: {str(e)}") 
         raise NetworkErrorException
+    except HTTPException:
+        raise
     except Exception as e:  # Обработка всех других исключений 
-        print(e)
         logger.error(f"Ошибка: {str(e)}") 
         raise EnternalServerErrorException
 
 
 
 
+#пакетное добавление фильмов в избранное
+@router.post("/batch", response_model=SBatchResult)
+async def add_many_to_favorites(request: Request, 
+                                ids: list[int] = Body(..., embed=True), 
+                                current_user: Users = Depends(get_current_user),
+                                films_dao_object: FilmsDAO = Depends(get_films_dao),
+                                session_client: aiohttp.ClientSession = Depends(get_client_session),
+                                session_db: AsyncSession = Depends(get_db_session)):
+    """ 
+    Эндпоинт для пакетного добавления фильмов в избранное пользователя
+ 
+    Параметры: 
+    - request: запрос, содержащий информацию о текущем запросе
+    - ids: список идентификаторов фильмов на Кинопоиске (тело запроса {"ids": [...]}),
+    не более FAVORITES_BATCH_MAX_SIZE
+    - current_user: аутентифицированный пользователь, полученный через зависимость get_current_user
+    - films_dao_object: объект для доступа к данным фильмов через FilmsDAO
+    - session_client: HTTP-клиент для выполнения запросов к внешним API
+    - session_db: асинхронная сессия для взаимодействия с базой данных
+
+    Уже добавленные фильмы отсеиваются одним запросом к БД, фильмы из каталога добавляются
+    без обращения к внешнему API, детали остальных запрашиваются параллельно (не более
+    FAVORITES_BATCH_CONCURRENCY одновременно, с приоритетом BULK), после чего новые фильмы
+    записываются в каталог, а все найденные - в избранное многострочными вставками
+ 
+    Возвращает: 
+    - {"results": [{"id": ..., "status": ...}]} по каждому id в порядке запроса, где status:
+    added, exists, not_found или error
+ 
+    Исключения: 
+    - NoUserExceptions: вызывается, если текущий пользователь не аутентифицирован
+    - TooManyIdsException: если передано больше FAVORITES_BATCH_MAX_SIZE id
+    """
+
+    if current_user is None:
+        logger.warning('Попытка доступа к профилю без аутентификации') 
+        raise NoUserExceptions
+
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.FAVORITES_BATCH_MAX_SIZE:
+        raise TooManyIdsException
+
+    existing = await films_dao_object.get_kinopoisk_ids(current_user.id, ids, session_db)
+    statuses = {film_id: 'exists' for film_id in existing}
+
+    missing = [film_id for film_id in ids if film_id not in existing]
+    catalogued = await CatalogDAO.get_ids(missing, session_db)
+
+    semaphore = asyncio.Semaphore(settings.FAVORITES_BATCH_CONCURRENCY)
+
+    async def fetch(film_id: int):
+        async with semaphore:
+            try:
+                film_data = await get_film_details(session_client, film_id, Priority.BULK)
+            except KinopoiskStatusError as e:
+                statuses[film_id] = 'not_found' if e.status == 404 else 'error'
+                return None
+            except (RateLimitExceeded, CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f'Не удалось получить фильм {film_id} при пакетном добавлении: {e!r}')
+                statuses[film_id] = 'error'
+                return None
+            except Exception as e:
+                # любая другая ошибка (например, ответ 200 не в JSON) касается только этого id
+                logger.error(f'Ошибка при получении фильма {film_id} при пакетном добавлении: {e!r}')
+                statuses[film_id] = 'error'
+                return None
+        if not (isinstance(film_data, dict) and 'kinopoiskId' in film_data):
+            statuses[film_id] = 'error'
+            return None
+        return {
+            'kinopoisk_id': film_id,
+            'film_name': film_data.get('nameRu') or '',
+            'description': film_data.get('description') or '',
+        }
+
+    to_fetch = [film_id for film_id in missing if film_id not in catalogued]
+    new_films = [film for film in await asyncio.gather(*(fetch(film_id) for film_id in to_fetch)) if film]
+
+    added = await films_dao_object.add_movies_to_db(current_user.id, catalogued, new_films, session_db)
+    for film_id in [*catalogued, *(film['kinopoisk_id'] for film in new_films)]:
+        # не вставленные строки добавил параллельный запрос
+        statuses[film_id] = 'added' if film_id in added else 'exists'
+
+    logger.info(f'Пакетное добавление в избранное пользователя {current_user.id}: {len(added)} из {len(ids)}')
+    return {'results': [{'id': film_id, 'status': statuses[film_id]} for film_id in ids]}
+
+
+
+
 #Удаление фильма из избранного
-@router.delete("/{kinopoisk_id}")
+@router.delete("/{kinopoisk_id}", response_model=SDetail)
 async def delete_from_favorites(request: Request, 
                            kinopoisk_id: int, 
                            current_user: Users = Depends(get_current_user),
@@ -150,17 +255,14 @@ async def delete_from_favorites(request: Request,
         raise NoUserExceptions
 
     try: 
-        is_exists = await films_dao_object.find_one_or_none(session_db,kinopoisk_id=kinopoisk_id)
-        if is_exists is None: 
+        deleted = await films_dao_object.del_by_id(current_user.id, kinopoisk_id, session_db) 
+        if not deleted: 
             logger.warning(f'Фильм с kinopoisk_id {kinopoisk_id} не найден в избранном пользователя {current_user.id}') 
             return {"detail": "Фильм не найден в избранном"}
 
-        await films_dao_object.del_by_id(current_user.id, kinopoisk_id, session_db) 
-
         return {"detail": "Фильм успешно удален из избранного"}
 
     except Exception as e: 
-        print(e)
         logger.error(f'Неизвестная ошибка при удалении фильма: {str(e)}') 
         raise NoMovieIDException
 
@@ -170,8 +272,12 @@ async def delete_from_favorites(request: Request,
 
 
 # просмотр списка избранных фильмов
-@router.get("/")
+@router.get("/", response_model=list[SFavoriteFilm], response_model_exclude_unset=True)
 async def get_all_information(request: Request, 
+                            response: Response,
+                            cursor: int | None = Query(None, ge=0),
+                            limit: int = Query(settings.FAVORITES_PAGE_DEFAULT_LIMIT, ge=1, le=settings.FAVORITES_PAGE_MAX_LIMIT),
+                            fields: str | None = Query(None),
                             current_user: Users = Depends(get_current_user),
                             films_dao_object: FilmsDAO = Depends(get_films_dao),
                             session_db: AsyncSession = Depends(get_db_session)):
@@ -181,15 +287,25 @@ async def get_all_information(request: Request,
  
     Параметры: 
     - request: текущий запрос от клиента
+    - response: объект ответа, в который записывается заголовок X-Next-Cursor
+    - cursor: id записи, после которой начинается страница (значение X-Next-Cursor из 
+    предыдущего ответа); без него возвращается первая страница
+    - limit: максимальное число фильмов на странице
+    - fields: список полей через запятую (id, user_id, kinopoisk_id, film_name, description);
+    из БД читаются только запрошенные столбцы, по умолчанию - все
     - current_user: информация о текущем пользователе, получаемая из системы аутентификации
     - films_dao_object: объект DAO для работы с фильмами
     - session_db: объект сессии базы данных для выполнения асинхронных операций
  
     Возвращает: 
-    - список фильмов, доступных для текущего пользователя
+    - список фильмов, доступных для текущего пользователя, упорядоченный по id; если есть
+    следующая страница, ее курсор передается в заголовке X-Next-Cursor
+    - заголовок ETag, построенный из версии избранного пользователя и параметров страницы;
+    если If-None-Match совпадает с ним, возвращается 304 без тела, а сама страница не читается
  
     Исключения и ошибки: 
     - NoUserExceptions: вызывается, если текущий пользователь не аутентифицирован
+    - InvalidFieldsException: если в fields передано неизвестное поле
 
     """
 
@@ -197,7 +313,21 @@ async def get_all_information(request: Request,
         logger.warning('Попытка доступа к профилю без аутентификации') 
         raise NoUserExceptions
     
+    selected = FilmsDAO.PAGE_FIELDS
+    if fields:
+        selected = [field.strip() for field in fields.split(',') if field.strip()]
+        if not selected or any(field not in FilmsDAO.PAGE_FIELDS for field in selected):
+            raise InvalidFieldsException
     
-    movies = await films_dao_object.get_all(current_user.id, session_db)
+    # версия меняется при любом изменении избранного и при обновлении данных фильмов в каталоге
+    version = await UsersDAO.get_favorites_version(current_user.id, session_db)
+    etag = make_etag(current_user.id, version, cursor, limit, ','.join(selected))
+    if etag_matches(request, etag):
+        return not_modified(etag, FAVORITES_CACHE_CONTROL)
+
+    movies, next_cursor = await films_dao_object.get_page(current_user.id, session_db, selected, cursor, limit)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = FAVORITES_CACHE_CONTROL
     return movies
-      
\ No newline at end of file
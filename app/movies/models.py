@@ -1,13 +1,54 @@
 from app.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index, func, text
 
 from app.users.models import Users
 
-class Films(Base):
-    __tablename__ = 'films'
+# каталог фильмов: одна строка на фильм Кинопоиска, общая для всех пользователей
+class Catalog(Base):
+    __tablename__ = 'catalog'
+    __table_args__ = (
+        UniqueConstraint('kinopoisk_id', name='uq_catalog_kinopoisk_id'),
+        Index('ix_catalog_updated_at', 'updated_at'),
+    )
 
     id = Column(Integer, primary_key= True, autoincrement=True) 
-    user_id = Column(Integer, ForeignKey(Users.id),nullable=False) 
-    kinopoisk_id = Column(Integer,nullable=False)
+    kinopoisk_id = Column(Integer, nullable=False)
     film_name = Column(String, nullable=False)
-    description = Column(String, nullable=False)
\ No newline at end of file
+    description = Column(String, nullable=False)
+    # время последнего получения данных фильма от Кинопоиска
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # неудачные попытки фонового обновления подряд и время, раньше которого строку не обновляем
+    refresh_failures = Column(Integer, nullable=False, server_default='0', default=0)
+    refresh_retry_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# конфигурация полнотекстового поиска Postgres; запрос должен использовать то же
+# выражение, что и индекс ix_catalog_search, поэтому константы встраиваются в SQL,
+# а не передаются параметрами
+SEARCH_CONFIG = 'russian'
+
+
+def catalog_search_vector():
+    # название весит больше описания
+    columns = Catalog.__table__.c
+    config = text(f"'{SEARCH_CONFIG}'::regconfig")
+    return func.setweight(func.to_tsvector(config, columns.film_name), text("'A'")).op('||')(
+        func.setweight(func.to_tsvector(config, columns.description), text("'B'"))
+    )
+
+
+# GIN-индекс по выражению есть только в Postgres, на других СУБД поиск идет через ILIKE
+Index('ix_catalog_search', catalog_search_vector(), postgresql_using='gin').ddl_if(dialect='postgresql')
+
+
+# избранное: связь пользователя с фильмом из каталога
+class Favorites(Base):
+    __tablename__ = 'favorites'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'film_id', name='uq_favorites_user_id_film_id'),
+        Index('ix_favorites_user_id_id', 'user_id', 'id'),
+    )
+
+    id = Column(Integer, primary_key= True, autoincrement=True) 
+    user_id = Column(Integer, ForeignKey(Users.id), nullable=False) 
+    film_id = Column(Integer, ForeignKey(Catalog.id), nullable=False)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.database import async_session_maker
+from app.kinopoisk.api import api_key_pool, film_details_cache, refresh_film_details
+from app.kinopoisk.client import kinopoisk_client
+from app.kinopoisk.limiter import RateLimitExceeded
+from app.kinopoisk.resilience import CircuitOpenError
+from app.logger import logger
+from app.movies.dao import CatalogDAO, UsersDAO
+
+
+class RefreshScheduler:
+    """
+    Фоновое обновление деталей фильмов до того, как они понадобятся
+
+    Раз в interval секунд (со случайным разбросом ±jitter, чтобы воркеры не обращались
+    к API одновременно) выбирается не больше budget фильмов: сначала самые популярные
+    записи кеша, которые устареют в ближайшие ahead секунд, затем строки каталога
+    старше catalog_max_age. Детали запрашиваются у API с приоритетом BACKGROUND, после
+    чего обновляются кеш и каталог. Проход пропускается, если у ключей осталось меньше
+    quota_reserve дневной квоты. Фильм, который не удалось обновить (например, удаленный
+    из Кинопоиска), откладывается на retry_backoff секунд, с каждой неудачей вдвое дольше,
+    чтобы одни и те же строки не занимали бюджет каждого прохода
+    """
+
+    def __init__(self, interval: float, jitter: float, budget: int, ahead: float,
+                 catalog_max_age: float, quota_reserve: float, retry_backoff: float = 60 * 60,
+                 retry_backoff_max: float = 7 * 24 * 60 * 60):
+        self.interval = interval
+        self.jitter = jitter
+        self.budget = budget
+        self.ahead = ahead
+        self.catalog_max_age = catalog_max_age
+        self.quota_reserve = quota_reserve
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.skipped_runs = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.last_run_at: datetime | None = None
+        self.last_duration = 0.0
+        self.next_run_at: datetime | None = None
+        self.cache_due = 0
+        self.cache_stale = 0
+        self.catalog_due = 0
+        self.catalog_oldest_age = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.next_run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f'Ошибка фонового обновления деталей фильмов: {e!r}')
+
+    def _cache_candidates(self) -> list:
+        # записи, которые скоро устареют, от самых популярных; ни разу не прочитанные не обновляем
+        now = time.monotonic()
+        entries = film_details_cache.expiring(self.ahead)
+        self.cache_due = len(entries)
+        self.cache_stale = sum(1 for _, entry in entries if now >= entry.expires_at)
+        entries.sort(key=lambda item: item[1].hits, reverse=True)
+        return [film_id for film_id, entry in entries if entry.hits > 0]
+
+    async def run_once(self) -> int:
+        """Один проход обновления; возвращает число обновленных фильмов"""
+        started = time.monotonic()
+        self.runs += 1
+        self.last_run_at = datetime.now(timezone.utc)
+        updated_before = self.last_run_at - timedelta(seconds=self.catalog_max_age)
+
+        film_ids = self._cache_candidates()[:self.budget]
+        async with async_session_maker() as session:
+            self.catalog_due, oldest = await CatalogDAO.get_outdated_stats(updated_before, session)
+            if oldest is not None and oldest.tzinfo is None:
+                oldest = oldest.replace(tzinfo=timezone.utc)
+            self.catalog_oldest_age = (self.last_run_at - oldest).total_seconds() if oldest else 0.0
+
+            if api_key_pool.remaining_share() < self.quota_reserve:
+                self.skipped_runs += 1
+                logger.info('Фоновое обновление пропущено: осталось мало дневной квоты ключей API')
+                return 0
+            if len(film_ids) < self.budget:
+                outdated = await CatalogDAO.get_outdated(updated_before, self.budget, session)
+                film_ids += [film_id for film_id in outdated if film_id not in film_ids][:self.budget - len(film_ids)]
+
+        # запросы идут по одному, без сессии БД: фоновое обновление не должно занимать
+        # соединения пула и вытеснять интерактивные запросы из лимитера
+        films = []
+        failed = []
+        for film_id in film_ids:
+            try:
+                film = json.loads((await refresh_film_details(kinopoisk_client.session, film_id)).body)
+            except (RateLimitExceeded, CircuitOpenError) as e:
+                logger.warning(f'Фоновое обновление остановлено до следующего прохода: {e!r}')
+                break
+            except Exception as e:
+                self.failed += 1
+                failed.append(film_id)
+                logger.warning(f'Не удалось обновить детали фильма {film_id}: {e!r}')
+                continue
+            if isinstance(film, dict) and 'kinopoiskId' in film:
+                films.append({
+                    'kinopoisk_id': film_id,
+                    'film_name': film.get('nameRu') or '',
+                    'description': film.get('description') or '',
+                })
+            else:
+                self.failed += 1
+                failed.append(film_id)
+
+        if failed:
+            async with async_session_maker() as session:
+                await CatalogDAO.mark_refresh_failed(failed, self.retry_backoff, self.retry_backoff_max, session)
+
+        if films:
+            async with async_session_maker() as session:
+                # в каталоге обновляются только уже сохраненные фильмы; если данные фильма
+                # изменились, меняется версия избранного (и ETag) у всех, кто его добавил
+                stored = await CatalogDAO.get_by_kinopoisk_ids([film['kinopoisk_id'] for film in films], session)
+                catalogued = [film for film in films if film['kinopoisk_id'] in stored]
+                changed = [
+                    stored[film['kinopoisk_id']].id for film in catalogued
+                    if (stored[film['kinopoisk_id']].film_name, stored[film['kinopoisk_id']].description)
+                    != (film['film_name'], film['description'])
+                ]
+                await CatalogDAO.save_many(catalogued, session, commit=False)
+                if changed:
+                    await UsersDAO.bump_favorites_version(session, film_ids=changed)
+                await session.commit()
+
+        self.refreshed += len(films)
+        self.last_duration = time.monotonic() - started
+        return len(films)
+
+    def stats(self) -> dict:
+        return {
+            'running': self._task is not None,
+            'runs': self.runs,
+            'skipped_runs': self.skipped_runs,
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'last_run_at': self.last_run_at,
+            'last_duration': self.last_duration,
+            'next_run_at': self.next_run_at,
+            'cache_due': self.cache_due,
+            'cache_stale': self.cache_stale,
+            'catalog_due': self.catalog_due,
+            'catalog_oldest_age': self.catalog_oldest_age,
+        }
+
+
+refresh_scheduler = RefreshScheduler(
+    interval=settings.REFRESH_INTERVAL,
+    jitter=settings.REFRESH_JITTER,
+    budget=settings.REFRESH_BUDGET,
+    ahead=settings.REFRESH_AHEAD,
+    catalog_max_age=settings.REFRESH_CATALOG_MAX_AGE,
+    quota_reserve=settings.REFRESH_QUOTA_RESERVE,
+    retry_backoff=settings.REFRESH_RETRY_BACKOFF,
+    retry_backoff_max=settings.REFRESH_RETRY_BACKOFF_MAX,
+)
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, Request, Query
-from urllib.parse import quote
+from enum import Enum
+
+from fastapi import APIRouter, Depends, Request, Response, Query, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 import aiohttp
 
 from app.config import settings
+from app.dao.dependencies import get_db_session
+from app.movies.dao import CatalogDAO
+from app.movies.schemas import SFilmDetails, SFilmSearchItem
 from app.movies.dependencies import get_client_session
+from app.kinopoisk.api import get_film_details_payload, search_films, normalize_keyword, KinopoiskStatusError
+from app.kinopoisk.api import is_film_details, is_upstream_failure, UnexpectedSearchResponse
+from app.kinopoisk.limiter import RateLimitExceeded
+from app.kinopoisk.resilience import CircuitOpenError
 from app.logger import logger
-from app.exceptions import NoUserExceptions, ExternalAPIException, FilmNotFoundException, UnexpectedStructureException
+from app.responses import payload_response
+from app.exceptions import NoUserExceptions, ExternalAPIException, FilmNotFoundException
 from app.exceptions import UnexpectedResponseFormatException, ErrorWithResponseException, ErrorGettingDetailsException
+from app.exceptions import UpstreamRateLimitException, ExternalAPIUnavailableException, upstream_status_exception
 from app.users.models import Users
 from app.users.dependencies import get_current_user
 
@@ -18,13 +29,27 @@ router = APIRouter(
     )
 
 
+# ответы зависят от пользователя (нужна авторизация), поэтому кешировать их может только клиент
+FILM_DETAILS_CACHE_CONTROL = f'private, max-age={settings.FILM_DETAILS_MAX_AGE}'
+SEARCH_CACHE_CONTROL = f'private, max-age={settings.SEARCH_MAX_AGE}'
+
+
+class SearchMode(str, Enum):
+    upstream = 'upstream'
+    local = 'local'
+    auto = 'auto'
+
+
 
 #Поиск фильмов
-@router.get("/search")
+@router.get("/search", response_model=list[SFilmSearchItem])
 async def search_movies(request: Request, 
+                        response: Response,
                         keyword: str = Query(...), 
+                        mode: SearchMode = Query(SearchMode(settings.SEARCH_DEFAULT_MODE)),
                         current_user: Users = Depends(get_current_user),
-                        session_client: aiohttp.ClientSession = Depends(get_client_session)
+                        session_client: aiohttp.ClientSession = Depends(get_client_session),
+                        session_db: AsyncSession = Depends(get_db_session)
                         ):
     
     """ 
@@ -32,19 +57,28 @@ async def search_movies(request: Request,
  
     Параметры: 
     - request: объект запроса
+    - response: объект ответа, в который записывается заголовок X-Search-Source
     - keyword: строка, по которой выполняется поиск фильмов (обязательный параметр)
+    - mode: где искать: upstream - в API Кинопоиска, local - в каталоге сохраненных фильмов,
+    auto - сначала в каталоге, а если там меньше SEARCH_LOCAL_MIN_RESULTS фильмов - в API
+    Кинопоиска (по умолчанию SEARCH_DEFAULT_MODE, то есть upstream)
     - current_user: текущий аутентифицированный пользователь (при отсутствии выбрасывается исключение)
     - session_client: объект сессии для выполнения запросов к внешнему API
+    - session_db: асинхронная сессия для поиска по каталогу
  
     Возвращает: 
-    - список фильмов, соответствующих ключевому слову, при успешном поиске
+    - список фильмов, соответствующих ключевому слову, при успешном поиске; результаты из
+    каталога упорядочены по релевантности и содержат filmId, nameRu и description, источник
+    указывается в заголовке X-Search-Source (local или upstream); ответ API Кинопоиска
+    отдается с ETag и Cache-Control, при совпадении If-None-Match - 304 без тела
      
     Исключения и ошибки: 
     - NoUserExceptions: вызывается, если текущий пользователь не аутентифицирован
     - ExternalAPIException: если произошла ошибка при получении данных от внешнего API
     - FilmNotFoundException: если фильмы по ключевому слову не найдены
-    - UnexpectedStructureException: если структура полученного ответа не соответствует ожиданиям
-    - UnexpectedResponseFormatException: если полученный ответ имеет непредвиденный формат
+    - UnexpectedResponseFormatException: если ответ API не содержит списка films
+    - UpstreamRateLimitException: если превышен лимит запросов к API Кинопоиска
+    - ExternalAPIUnavailableException: если API Кинопоиска недоступен и в кеше нет данных
     - ErrorWithResponseException: если произошла другая ошибка в процессе обработки запроса
     """
 
@@ -53,37 +87,46 @@ async def search_movies(request: Request,
             raise NoUserExceptions
     
 
-    api_key = settings.API_key
-    
-    url = f"https://kinopoiskapiunofficial.tech/api/v2.1/films/search-by-keyword?keyword={quote(keyword)}" 
+    local_films = []
+    if mode != SearchMode.upstream:
+        local_films = await CatalogDAO.search(normalize_keyword(keyword), settings.SEARCH_LOCAL_LIMIT, session_db)
+        if mode == SearchMode.local or len(local_films) >= settings.SEARCH_LOCAL_MIN_RESULTS:
+            if not local_films:
+                logger.warning(f"Фильмы по ключевому слову '{keyword}' не найдены в каталоге.") 
+                raise FilmNotFoundException
+            response.headers['X-Search-Source'] = 'local'
+            return local_films
 
-    headers = {
-        'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
-    }
-    
     try:
-        async with session_client.get(url, headers=headers) as response: 
-            if response.status != 200: 
-                logger.error(f"Ошибка при получении данных от внешнего сервиса: {response.status}") 
+        try:
+            films = await search_films(session_client, keyword)
+        except Exception as e:
+            # в режиме auto при недоступном API отдаем то, что нашлось в каталоге
+            if local_films and (is_upstream_failure(e) or isinstance(e, RateLimitExceeded)):
+                logger.warning(f"API Кинопоиска недоступен, отдаем результаты поиска из каталога: {e!r}")
+                response.headers['X-Search-Source'] = 'local'
+                return local_films
+            if isinstance(e, KinopoiskStatusError):
+                logger.error(f"Ошибка при получении данных от внешнего сервиса: {e.status}") 
                 raise ExternalAPIException
-            
-            result = await response.json()
-        
-            # Валидация структуры ответа 
-            if isinstance(result, dict) and 'films' in result: 
-                films = result['films'] 
-                if isinstance(films, list): 
-                    if not films:
-                        logger.warning(f"Фильмы по ключевому слову '{keyword}' не найдены.") 
-                        raise FilmNotFoundException 
-                    return films
-                else:  
-                    logger.error(f"Ожидался список 'films', получен: {type(films).name}: {result}") 
-                    raise UnexpectedStructureException
-            else:  
-                logger.error(f"Непредвиденный формат ответа: {result}")  
+            if isinstance(e, UnexpectedSearchResponse):
+                logger.error(str(e))
                 raise UnexpectedResponseFormatException
+            raise
+
+        if films.body == b'[]':
+            logger.warning(f"Фильмы по ключевому слову '{keyword}' не найдены.") 
+            raise FilmNotFoundException 
+        # готовый JSON из кеша отдается как есть, без разбора и повторной сериализации
+        return payload_response(request, films, SEARCH_CACHE_CONTROL, headers={'X-Search-Source': 'upstream'})
+    except RateLimitExceeded: 
+        logger.warning("Превышен лимит запросов к API Кинопоиска при поиске фильмов.") 
+        raise UpstreamRateLimitException
+    except CircuitOpenError: 
+        logger.warning("API Кинопоиска недоступен при поиске фильмов.") 
+        raise ExternalAPIUnavailableException
+    except HTTPException:
+        raise
     except Exception as e: 
         logger.exception("Произошла ошибка при поиске фильмов.") 
         raise ErrorWithResponseException
@@ -91,7 +134,7 @@ async def search_movies(request: Request,
 
 
 # получение деталей фильма
-@router.get("/{id}")
+@router.get("/{id}", response_model=SFilmDetails)
 async def get_ditails(request: Request, id: int, 
                       current_user: Users = Depends(get_current_user),
                       session: aiohttp.ClientSession = Depends(get_client_session)
@@ -107,12 +150,17 @@ async def get_ditails(request: Request, id: int,
     - session: асинхронная сессия для выполнения HTTP-запросов к API
 
     Возвращает: 
-    - словарь с деталями фильма, если запрос успешен и ответ имеет ожидаемую структуру
+    - JSON с деталями фильма в том виде, в котором его вернул API Кинопоиска (из кеша или
+    из API), если ответ имеет ожидаемую структуру, с заголовками ETag (хеш содержимого) и
+    Cache-Control; если If-None-Match совпадает с ETag - 304 без тела
  
     Исклчения и ошибки: 
     - NoUserExceptions: вызывается, если текущий пользователь не аутентифицирован
     - FilmNotFoundException: если фильм с заданным ID не найден
+    - ExternalAPIException: если API Кинопоиска ответил ошибкой (кроме 404 и исчерпанной квоты)
     - UnexpectedResponseFormatException: если получен непредвиденный формат ответа от API 
+    - UpstreamRateLimitException: если превышен лимит запросов или исчерпана квота ключей API Кинопоиска
+    - ExternalAPIUnavailableException: если API Кинопоиска недоступен и в кеше нет данных
     - ErrorGettingDetailsException: вызывается при возникновении ошибки во время получения деталей фильма
     """
 
@@ -120,29 +168,31 @@ async def get_ditails(request: Request, id: int,
             logger.warning('Попытка доступа к профилю без аутентификации') 
             raise NoUserExceptions
     
-    api_key = settings.API_key
-    
-    url = f"https://kinopoiskapiunofficial.tech/api/v2.2/films/{id}" 
-    
-    headers = {
-        'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
-    }
     try:
-        async with session.get(url, headers=headers) as response: 
-            if response.status != 200: 
+        try:
+            payload = await get_film_details_payload(session, id)
+        except KinopoiskStatusError as e:
+            if e.status == 404:
                 logger.error(f"Фильм с ID {id} не найден") 
-                raise FilmNotFoundException
-            
-            result = await response.json()
-        
-
-            # валидация структуры ответа 
-            if isinstance(result, dict) and 'kinopoiskId' in result: 
-                return result 
-            else: 
-                logger.error(f"Непредвиденный формат ответа: {result}") 
-                raise UnexpectedResponseFormatException
+            else:
+                logger.error(f"Ошибка при получении деталей фильма {id} от внешнего сервиса: {e.status}") 
+            raise upstream_status_exception(e.status)
+
+        # дешевая проверка структуры без разбора JSON; тело ответа API отдается как есть,
+        # а при совпадении If-None-Match с ETag - только 304 без тела
+        if is_film_details(payload.body): 
+            return payload_response(request, payload, FILM_DETAILS_CACHE_CONTROL)
+        else: 
+            logger.error(f"Непредвиденный формат ответа: {payload.body[:200]!r}") 
+            raise UnexpectedResponseFormatException
+    except RateLimitExceeded: 
+        logger.warning("Превышен лимит запросов к API Кинопоиска при получении деталей фильма.") 
+        raise UpstreamRateLimitException
+    except CircuitOpenError: 
+        logger.warning("API Кинопоиска недоступен при получении деталей фильма.") 
+        raise ExternalAPIUnavailableException
+    except HTTPException:
+        raise
     except Exception as e: 
         logger.exception("Произошла ошибка при получении деталей фильма.") 
         raise ErrorGettingDetailsException
\ No newline at end of file
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class SDetail(BaseModel):
+    detail: str
+
+
+class SFilmDetails(BaseModel):
+    # основные поля ответа API Кинопоиска; остальные поля передаются как есть
+    model_config = ConfigDict(extra='allow')
+
+    kinopoiskId: int
+    nameRu: str | None = None
+    nameOriginal: str | None = None
+    description: str | None = None
+    year: int | None = None
+
+
+class SFilmSearchItem(BaseModel):
+    # элемент списка films ответа search-by-keyword (или результата поиска по каталогу)
+    model_config = ConfigDict(extra='allow')
+
+    filmId: int
+    nameRu: str | None = None
+    description: str | None = None
+
+
+class SFavoriteFilm(BaseModel):
+    # в ответ попадают только поля, запрошенные в fields
+    id: int | None = None
+    user_id: int | None = None
+    kinopoisk_id: int | None = None
+    film_name: str | None = None
+    description: str | None = None
+
+
+class SBatchItem(BaseModel):
+    id: int
+    status: str
+
+
+class SBatchResult(BaseModel):
+    results: list[SBatchItem]
@@ -0,0 +1,50 @@
+import hashlib
+
+from fastapi import Request, Response
+
+from app.cache import Payload
+from app.compression import choose_encoding, encoded_etag
+from app.config import settings
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из значений, от которых зависит содержимое ответа"""
+    return '"' + hashlib.blake2b('|'.join(map(str, parts)).encode(), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def not_modified(etag: str, cache_control: str, headers: dict | None = None) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control, **(headers or {})})
+
+
+def payload_response(request: Request, payload: Payload, cache_control: str, headers: dict | None = None) -> Response:
+    """
+    Готовый JSON из кеша или 304, если у клиента уже есть эта версия
+
+    Тело не меньше COMPRESSION_MIN_SIZE байт отдается в сжатом виде, сохраненном в payload;
+    CompressionMiddleware такие ответы уже не трогает
+    """
+    headers = {'Cache-Control': cache_control, 'Vary': 'Accept-Encoding', **(headers or {})}
+    encoding = None
+    if len(payload) >= settings.COMPRESSION_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get('accept-encoding'))
+    # у каждого представления (исходного и сжатого) свой сильный ETag
+    etag = payload.etag if encoding is None else encoded_etag(payload.etag, encoding)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control, {'Vary': 'Accept-Encoding'})
+    if encoding is None:
+        return Response(content=payload.body, media_type='application/json', headers={'ETag': etag, **headers})
+    return Response(
+        content=payload.encoded(encoding),
+        media_type='application/json',
+        headers={'ETag': etag, 'Content-Encoding': encoding, **headers},
+    )
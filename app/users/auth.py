@@ -1,21 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta, timezone
 
 from app.config import settings
+from app.exceptions import PasswordHashBusyException
+from app.logger import logger
+from app.users.cache import invalidate_user
 from app.users.dao import UsersDAO
 
 
 # хеширование пароля и проверка при входе после регистрации 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt выполняется в отдельных потоках, чтобы не блокировать цикл событий
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_CONCURRENCY, thread_name_prefix='bcrypt')
+_password_slots = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def _run_password_task(func, *args):
+    try:
+        await asyncio.wait_for(_password_slots.acquire(), settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PasswordHashBusyException
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        _password_slots.release()
 
-#проверка что пароль соответствует хешированной версии 
-def verify_password(plain_password, hashed_password):
-    print('Verify')
-    return pwd_context.verify(plain_password, hashed_password)    
+
+async def get_password_hash(password):
+    return await _run_password_task(pwd_context.hash, password)
+
+#проверка что пароль соответствует хешированной версии; если хеш создан с другим
+#числом раундов bcrypt, вторым значением возвращается новый хеш
+async def verify_password(plain_password, hashed_password):
+    return await _run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 #функция для создания токена
@@ -32,10 +54,17 @@ def create_access_token(data:dict) -> str:
 
 # получаем пользователя
 async def authenticate_user(session, user_name:str, password:str): 
-    print(user_name, password)
     user = await UsersDAO.find_one_or_none(session, user_name=user_name)
-    print(user)
-    if user is None or not verify_password(password, user.password):
+    logger.debug('Вход пользователя %s: найден=%s', user_name, user is not None)
+    if user is None:
+        return None
+    is_valid, new_hash = await verify_password(password, user.password)
+    if not is_valid:
         return None
-    print(user)
-    return user
\ No newline at end of file
+    if new_hash is not None:
+        # изменилась стоимость bcrypt - перехешируем пароль при входе
+        await UsersDAO.update(session, user.id, password=new_hash)
+        user.password = new_hash
+        invalidate_user(user.id)
+        logger.debug('Пароль пользователя %s перехеширован', user.id)
+    return user
@@ -0,0 +1,14 @@
+from app.cache import TTLCache
+from app.config import settings
+
+
+# аутентифицированные пользователи по id, чтобы не ходить в БД на каждый запрос
+user_cache = TTLCache(max_entries=settings.USER_CACHE_MAX_ENTRIES, ttl=settings.USER_CACHE_TTL)
+
+# уже проверенные JWT: sha256 токена -> (id пользователя, exp); запись живет не дольше exp
+token_cache = TTLCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def invalidate_user(user_id: int):
+    """Удаляет пользователя из кеша; вызывается при любом изменении строки users"""
+    user_cache.invalidate(user_id)
@@ -1,9 +1,11 @@
+import hashlib
+
 from fastapi import Request, Depends
 from jose import jwt, JWTError
 from datetime import datetime,timezone
 from app.users.dao import UsersDAO
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.dao.dependencies import get_db_session
+from app.users.cache import user_cache, token_cache
+from app.database import async_session_maker
 
 
 from app.config import settings
@@ -19,7 +21,22 @@ def get_token(request: Request):
 
 
 
-async def get_current_user(token: str = Depends(get_token), session: AsyncSession = Depends(get_db_session)):
+def decode_token(token: str) -> int:
+    """
+    Проверяет подпись и срок действия JWT и возвращает id пользователя
+
+    Результат успешной проверки кешируется по sha256 токена не дольше его exp,
+    поэтому повторные запросы с той же кукой не проверяют подпись заново
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    now = datetime.now(timezone.utc).timestamp()
+    cached = token_cache.get(key)
+    if cached is not None:
+        user_id, expire = cached
+        if expire < now:
+            raise TokenExpiredException
+        return user_id
+
     try:  
         payload = jwt.decode(
             token, settings.SECRET_KEY, settings.ALGORITHM
@@ -27,12 +44,24 @@ async def get_current_user(token: str = Depends(get_token), session: AsyncSessio
     except JWTError:
         raise IncorrectFormatTokenException
     expire: str = payload.get('exp') 
-    if (not expire) or (int(expire) < datetime.now(timezone.utc).timestamp()):
+    if (not expire) or (int(expire) < now):
         raise TokenExpiredException
     user_id: str = payload.get('sub')
     if not user_id:
         raise UserIsNotPresentException
-    user = await UsersDAO.find_by_id(int(user_id),session)
+    token_cache.set(key, (int(user_id), int(expire)), ttl=min(settings.TOKEN_CACHE_TTL, int(expire) - now))
+    return int(user_id)
+
+
+async def get_current_user(token: str = Depends(get_token)):
+    user_id = decode_token(token)
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    # сессия открывается только при промахе кеша
+    async with async_session_maker() as session:
+        user = await UsersDAO.find_by_id(user_id,session)
     if not user:
         raise UserIsNotPresentException
+    user_cache.set(user_id, user)
     return user 
@@ -1,11 +1,16 @@
 from app.database import Base
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, UniqueConstraint
 
 
 
 class Users(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        UniqueConstraint('user_name', name='uq_users_user_name'),
+    )
 
     id = Column(Integer, primary_key= True, nullable=False) 
     user_name = Column(String, nullable=False) 
-    password = Column(String, nullable=False)
\ No newline at end of file
+    password = Column(String, nullable=False)
+    # увеличивается при каждом изменении списка избранного, из него строится ETag списка
+    favorites_version = Column(Integer, nullable=False, server_default='0', default=0)
\ No newline at end of file
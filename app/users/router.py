@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Request, Response, Form, Depends
+from fastapi import APIRouter, Request, Response, Form, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession 
 
 from app.users.dao import UsersDAO
 from app.users.models import Users
+from app.users.schemas import SMessage, SUserProfile
 from app.users.dependencies import get_current_user
 from app.dao.dependencies import get_db_session
 from app.logger import logger
@@ -22,7 +23,7 @@ router = APIRouter(
 
 
 #аутентификация 
-@router.post("/login")
+@router.post("/login", response_model=SMessage)
 async def login_user(
     request: Request, 
     response: Response, 
@@ -45,6 +46,7 @@ async def login_user(
 
     Исключения:
     - IncorrectEmailOrPasswordException: Выдается, если указаны неверные имя пользователя или пароль.
+    - PasswordHashBusyException: Выдается, если очередь на проверку пароля не освободилась вовремя.
     - Другие исключения: Логируются в случае возникновения ошибки, не связанной с аутентификацией.
     """
     
@@ -60,16 +62,16 @@ async def login_user(
 
         return {"message": "Вы успешно авторизовались!"}
 
-    except IncorrectEmailOrPasswordException: 
-        raise IncorrectEmailOrPasswordException
+    except HTTPException: 
+        raise
 
     except Exception as e: 
         logger.error(f"Ошибка при попытке входа: {str(e)}") 
-        return ErrorWithEntranceException
+        raise ErrorWithEntranceException
 
 
 #регистрация
-@router.post("/register") 
+@router.post("/register", response_model=SMessage) 
 async def register_user(
     request: Request, 
     user_name: str = Form(...), 
@@ -88,37 +90,39 @@ async def register_user(
     - session_db: асинхронная сессия базы данных, используемая для взаимодействия с базой данных
 
     В процессе регистрации проверяются  условия:
-    - проверка на существование пользователя с данным именем: если пользователь с 
-    таким именем уже зарегистрирован, будет вызван UserAlreadyExistsException
     - проверка совпадения паролей: если password и password_repeat не совпадают, 
     будет вызван DontMatchPassExceptions.
-    - если все проверки пройдены, пароль хешируется и пользователь добавляется в базу данных
+    - пароль хешируется и пользователь добавляется в базу данных одним INSERT ... ON CONFLICT: 
+    если пользователь с таким именем уже зарегистрирован, будет вызван UserAlreadyExistsException
+    - хеширование выполняется вне цикла событий; если очередь на хеширование не освободилась
+    за PASSWORD_HASH_QUEUE_TIMEOUT, будет вызван PasswordHashBusyException
 
     На выходе возвращается сообщение о успешной регистрации или ошибка, если что-то пошло не так.
     """
     try:
-        existing_user = await UsersDAO.find_one_or_none(session_db, user_name=user_name)
-        if existing_user:
-            logger.error(f"Попытка регистрации существующего пользователя: {user_name}") 
-            raise UserAlreadyExistsException 
-
         if password != password_repeat: 
             logger.error("Пароли не совпадают") 
             raise DontMatchPassExceptions
 
-        hashed_password = get_password_hash(password) 
+        hashed_password = await get_password_hash(password) 
 
-        await UsersDAO.add(session_db, user_name=user_name, password=hashed_password) 
+        # один INSERT ... ON CONFLICT по уникальному user_name вместо проверки и вставки
+        user_id = await UsersDAO.add_if_absent(session_db, ['user_name'], user_name=user_name, password=hashed_password) 
+        if user_id is None:
+            logger.error(f"Попытка регистрации существующего пользователя: {user_name}") 
+            raise UserAlreadyExistsException 
 
         logger.info(f"Пользователь успешно зарегистрирован: {user_name}") 
         return {"message": "Вы успешно зарегистрированы!"}
+    except HTTPException: 
+        raise
     except Exception as e:  
         logger.error(f"Ошибка при регистрации: {str(e)}") 
-        return ErrorWithRegisterException
+        raise ErrorWithRegisterException
 
 
 # получение профиля пользователя
-@router.get('/profile')
+@router.get('/profile', response_model=SUserProfile)
 async def get_profile(request: Request, current_user: Users = Depends(get_current_user)):
     """
     Эндпоинт для получения профиля текущего пользователя
@@ -128,7 +132,7 @@ async def get_profile(request: Request, current_user: Users = Depends(get_curren
     - current_user: объект пользователя, полученный с помощью зависимости get_current_user
 
     Возвращает:
-    - профиль пользователя, если пользователь аутентифицирован
+    - профиль пользователя (id и имя, без хеша пароля), если пользователь аутентифицирован
     
     Исключения и ошибки:
     - NoUserExceptions: вызывается, если текущий пользователь не аутентифицирован
@@ -142,6 +146,8 @@ async def get_profile(request: Request, current_user: Users = Depends(get_curren
 
         return current_user
     
+    except HTTPException: 
+        raise
     except Exception as e: 
         logger.error(f"Ошибка при получении профиля: {str(e)}") 
-        return ErrorProfileException
\ No newline at end of file
+        raise ErrorProfileException
\ No newline at end of file
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class SMessage(BaseModel):
+    message: str
+
+
+class SUserProfile(BaseModel):
+    # профиль отдается без хеша пароля
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_name: str
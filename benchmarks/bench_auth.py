@@ -0,0 +1,50 @@
+"""
+Бенчмарк накладных расходов аутентификации на один запрос
+
+Сравнивает проверку JWT в get_current_user без кеша (jose.jwt.decode и проверка
+exp на каждый запрос) и с кешем проверенных токенов. Пользователь берется из
+кеша пользователей, поэтому БД не нужна.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_auth [число_итераций]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks import stub_settings
+
+stub_settings.apply()
+
+from app.users.auth import create_access_token
+from app.users.cache import token_cache, user_cache
+from app.users.dependencies import get_current_user
+
+
+def run(iterations: int, use_token_cache: bool) -> float:
+    token = create_access_token({'sub': '1'})
+    user_cache.set(1, object())
+
+    async def loop():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            if not use_token_cache:
+                token_cache.clear()
+            await get_current_user(token)
+        return time.perf_counter() - started
+
+    return asyncio.run(loop())
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    before = run(iterations, use_token_cache=False)
+    after = run(iterations, use_token_cache=True)
+    print(f'итераций: {iterations}')
+    print(f'без кеша токенов: {before / iterations * 1e6:.1f} мкс/запрос')
+    print(f'с кешем токенов:  {after / iterations * 1e6:.1f} мкс/запрос')
+    print(f'ускорение: x{before / after:.1f}')
+
+
+if __name__ == '__main__':
+    main()
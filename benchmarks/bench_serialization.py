@@ -0,0 +1,114 @@
+"""
+Бенчмарк сериализации ответов
+
+Сравнивает стоимость формирования ответа FastAPI для страницы избранного и профиля
+пользователя: прежний вариант (обработчик возвращает словари или ORM-объект, FastAPI
+обходит их через jsonable_encoder и сериализует стандартным json) и текущий (схема
+ответа из app/*/schemas.py, сериализация pydantic-core и ORJSONResponse).
+Приложения вызываются напрямую через ASGI, без сети и БД.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_serialization [число_итераций] [фильмов_на_странице]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks import stub_settings
+
+stub_settings.apply()
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from app.movies.schemas import SFavoriteFilm
+from app.users.models import Users
+from app.users.schemas import SUserProfile
+
+
+def make_page(size: int) -> list:
+    return [
+        {
+            'id': i,
+            'user_id': 1,
+            'kinopoisk_id': 100000 + i,
+            'film_name': f'Фильм {i}',
+            'description': 'Описание фильма, которое бывает довольно длинным. ' * 10,
+        }
+        for i in range(size)
+    ]
+
+
+def make_apps(page: list, user: Users) -> tuple:
+    before = FastAPI()
+    after = FastAPI(default_response_class=ORJSONResponse)
+
+    @before.get('/favorites')
+    async def favorites_before():
+        return page
+
+    @before.get('/profile')
+    async def profile_before():
+        return user
+
+    @after.get('/favorites', response_model=list[SFavoriteFilm], response_model_exclude_unset=True)
+    async def favorites_after():
+        return page
+
+    @after.get('/profile', response_model=SUserProfile)
+    async def profile_after():
+        return user
+
+    return before, after
+
+
+async def call(app: FastAPI, path: str, iterations: int) -> float:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'headers': [], 'client': ('127.0.0.1', 1), 'server': ('127.0.0.1', 80),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+
+def report(title: str, iterations: int, before: float, after: float):
+    print(f'{title}:')
+    print(f'  dict/ORM + jsonable_encoder + json: {before / iterations * 1e6:.1f} мкс/запрос')
+    print(f'  схема ответа + orjson:              {after / iterations * 1e6:.1f} мкс/запрос')
+    print(f'  ускорение: x{before / after:.1f}')
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    user = Users(id=1, user_name='bench', password='$2b$12$' + 'x' * 53)
+    before, after = make_apps(make_page(page_size), user)
+
+    async def run():
+        # прогрев: построение схем и маршрутов при первом вызове
+        for app in (before, after):
+            await call(app, '/favorites', 10)
+            await call(app, '/profile', 10)
+        return (
+            await call(before, '/favorites', iterations), await call(after, '/favorites', iterations),
+            await call(before, '/profile', iterations), await call(after, '/profile', iterations),
+        )
+
+    favorites_before, favorites_after, profile_before, profile_after = asyncio.run(run())
+    print(f'итераций: {iterations}, фильмов на странице: {page_size}')
+    report('страница избранного', iterations, favorites_before, favorites_after)
+    report('профиль', iterations, profile_before, profile_after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Подготовка БД для нагрузочных тестов
+
+Пересоздает таблицы приложения по моделям (Base.metadata, вместе с индексами, в том
+числе GIN-индексом поиска на PostgreSQL) и заполняет каталог фильмами из
+benchmarks/fake_kinopoisk.py, чтобы локальный поиск и избранное работали с данными.
+Подходит SQLite (через aiosqlite) или локальный PostgreSQL; все таблицы
+в указанной БД удаляются, поэтому не указывайте рабочую базу.
+
+Запуск из корня проекта:
+    python -m benchmarks.db_fixture [DATABASE_URL] [фильмов_в_каталоге]
+По умолчанию sqlite+aiosqlite:///bench.db и 1000 фильмов.
+"""
+import asyncio
+import sys
+
+from benchmarks import stub_settings
+
+stub_settings.apply()
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.movies.dao import CatalogDAO
+import app.movies.models  # noqa: F401 - регистрирует таблицы каталога и избранного в Base.metadata
+import app.users.models  # noqa: F401
+from benchmarks.fake_kinopoisk import film_details
+
+
+DEFAULT_DATABASE_URL = 'sqlite+aiosqlite:///bench.db'
+SEED_BATCH_SIZE = 500
+
+
+async def prepare_database(database_url: str = DEFAULT_DATABASE_URL, films: int = 1000):
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+        session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_maker() as session:
+            for start in range(1, films + 1, SEED_BATCH_SIZE):
+                rows = []
+                for film_id in range(start, min(start + SEED_BATCH_SIZE, films + 1)):
+                    film = film_details(film_id)
+                    rows.append({
+                        'kinopoisk_id': film_id, 'film_name': film['nameRu'], 'description': film['description'],
+                    })
+                await CatalogDAO.save_many(rows, session)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    database_url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATABASE_URL
+    films = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    asyncio.run(prepare_database(database_url, films))
+    print(f'БД {database_url} подготовлена, фильмов в каталоге: {films}')
+
+
+if __name__ == '__main__':
+    main()
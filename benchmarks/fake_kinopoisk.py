@@ -0,0 +1,172 @@
+"""
+Локальная замена API Кинопоиска для нагрузочных тестов
+
+Отвечает на те же запросы, что использует приложение:
+    GET /api/v2.2/films/{id}                         - детали фильма
+    GET /api/v2.1/films/search-by-keyword?keyword=   - поиск по ключевому слову
+Фильмы с id от 1 до --films генерируются детерминированно, остальные id дают 404.
+Задержка ответа, доля ошибок 500 и доля ответов 429 (с Retry-After) настраиваются,
+поэтому можно проверить поведение приложения при медленном или перегруженном API.
+GET /stats возвращает число обработанных запросов по типам и статусам.
+
+Чтобы приложение обращалось к этому серверу, задайте
+    KINOPOISK_BASE_URL=http://127.0.0.1:8081
+
+Запуск из корня проекта:
+    python -m benchmarks.fake_kinopoisk [--port 8081] [--latency 0.05] [--error-rate 0.01] ...
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+
+# из этих слов составляются названия фильмов; генератор нагрузки ищет по ним
+WORDS = [
+    'звезда', 'город', 'ночь', 'война', 'любовь', 'дорога', 'море', 'тайна', 'зима', 'охота',
+    'остров', 'сердце', 'время', 'дом', 'небо', 'игра', 'огонь', 'путь', 'легенда', 'мечта',
+]
+
+
+@dataclass
+class FakeConfig:
+    films: int = 10000
+    latency: float = 0.05
+    latency_jitter: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    search_page_size: int = 20
+    seed: int = 0
+
+
+def film_name(film_id: int) -> str:
+    first, second = WORDS[film_id % len(WORDS)], WORDS[film_id // len(WORDS) % len(WORDS)]
+    return f'{first.capitalize()} и {second} {film_id}'
+
+
+def film_details(film_id: int) -> dict:
+    return {
+        'kinopoiskId': film_id,
+        'imdbId': f'tt{film_id:07d}',
+        'nameRu': film_name(film_id),
+        'nameOriginal': f'Film {film_id}',
+        'posterUrl': f'https://example.invalid/posters/{film_id}.jpg',
+        'ratingKinopoisk': round(5 + film_id % 50 / 10, 1),
+        'year': 1950 + film_id % 75,
+        'filmLength': 80 + film_id % 90,
+        'description': f'{film_name(film_id)} - история о том, как ' + ' '.join(
+            WORDS[(film_id * 7 + i) % len(WORDS)] for i in range(60)
+        ),
+        'shortDescription': f'Фильм {film_id}',
+        'type': 'FILM',
+        'countries': [{'country': 'Россия'}],
+        'genres': [{'genre': 'драма'}, {'genre': 'приключения'}],
+    }
+
+
+def search_item(film_id: int) -> dict:
+    details = film_details(film_id)
+    return {
+        'filmId': film_id,
+        'nameRu': details['nameRu'],
+        'nameEn': details['nameOriginal'],
+        'type': details['type'],
+        'year': str(details['year']),
+        'description': details['shortDescription'],
+        'filmLength': f'{details["filmLength"] // 60}:{details["filmLength"] % 60:02d}',
+        'countries': details['countries'],
+        'genres': details['genres'],
+        'rating': str(details['ratingKinopoisk']),
+        'ratingVoteCount': film_id * 13 % 100000,
+        'posterUrl': details['posterUrl'],
+        'posterUrlPreview': details['posterUrl'],
+    }
+
+
+def create_app(config: FakeConfig) -> web.Application:
+    rng = random.Random(config.seed)
+    stats = Counter()
+
+    async def delay_or_fail(kind: str) -> web.Response | None:
+        # задержка со случайным разбросом ±latency_jitter, затем, возможно, 429 или 500
+        await asyncio.sleep(config.latency * rng.uniform(1 - config.latency_jitter, 1 + config.latency_jitter))
+        stats[f'{kind}_requests'] += 1
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            stats[f'{kind}_429'] += 1
+            return web.json_response(
+                {'message': 'Too many requests'}, status=429, headers={'Retry-After': str(config.retry_after)},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            stats[f'{kind}_500'] += 1
+            return web.json_response({'message': 'Internal server error'}, status=500)
+        return None
+
+    async def get_film(request: web.Request) -> web.Response:
+        failure = await delay_or_fail('film')
+        if failure is not None:
+            return failure
+        film_id = int(request.match_info['id'])
+        if not 1 <= film_id <= config.films:
+            stats['film_404'] += 1
+            return web.json_response({'message': 'Film not found'}, status=404)
+        stats['film_200'] += 1
+        return web.Response(text=json.dumps(film_details(film_id), ensure_ascii=False), content_type='application/json')
+
+    async def search(request: web.Request) -> web.Response:
+        failure = await delay_or_fail('search')
+        if failure is not None:
+            return failure
+        keyword = request.query.get('keyword', '').strip().lower()
+        films = []
+        for film_id in range(1, config.films + 1):
+            if keyword and keyword in film_name(film_id).lower():
+                films.append(search_item(film_id))
+                if len(films) == config.search_page_size:
+                    break
+        stats['search_200'] += 1
+        body = {'keyword': keyword, 'pagesCount': 1, 'searchFilmsCountResult': len(films), 'films': films}
+        return web.Response(text=json.dumps(body, ensure_ascii=False), content_type='application/json')
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(dict(stats))
+
+    app = web.Application()
+    app.router.add_get('/api/v2.2/films/{id:\\d+}', get_film)
+    app.router.add_get('/api/v2.1/films/search-by-keyword', search)
+    app.router.add_get('/stats', get_stats)
+    return app
+
+
+def parse_args(argv=None) -> tuple:
+    parser = argparse.ArgumentParser(description='Локальная замена API Кинопоиска')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--films', type=int, default=FakeConfig.films, help='число фильмов с id 1..N')
+    parser.add_argument('--latency', type=float, default=FakeConfig.latency, help='средняя задержка ответа, с')
+    parser.add_argument('--latency-jitter', type=float, default=FakeConfig.latency_jitter,
+                        help='разброс задержки, доля от --latency')
+    parser.add_argument('--error-rate', type=float, default=FakeConfig.error_rate, help='доля ответов 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=FakeConfig.rate_limit_rate, help='доля ответов 429')
+    parser.add_argument('--retry-after', type=int, default=FakeConfig.retry_after, help='Retry-After для 429, с')
+    parser.add_argument('--seed', type=int, default=FakeConfig.seed)
+    args = parser.parse_args(argv)
+    config = FakeConfig(
+        films=args.films, latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed,
+    )
+    return args.host, args.port, config
+
+
+def main(argv=None):
+    host, port, config = parse_args(argv)
+    web.run_app(create_app(config), host=host, port=port, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
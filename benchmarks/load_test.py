@@ -0,0 +1,341 @@
+"""
+Нагрузочный тест API
+
+Виртуальные пользователи (--concurrency) регистрируются, входят в систему и в течение
+--duration секунд выполняют смесь запросов (--mix): детали фильма, поиск, список
+избранного, добавление и удаление фильма. Для каждого эндпоинта считаются число
+запросов, ошибок (статусы, кроме 2xx и 304), коды ответов, пропускная способность
+и задержки p50/p95/p99; результат записывается в JSON (--output), чтобы прогоны до
+и после изменения можно было сравнить.
+
+С --spawn тест сам поднимает окружение: benchmarks/fake_kinopoisk.py вместо API
+Кинопоиска, БД из benchmarks/db_fixture.py (по умолчанию SQLite) и приложение
+под uvicorn; параметры приложения можно переопределить переменными окружения.
+Без --spawn запросы идут на уже запущенное приложение по --base-url.
+
+Запуск из корня проекта:
+    python -m benchmarks.load_test --spawn --duration 30 --concurrency 20 --output load.json
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --fake-url http://127.0.0.1:8081
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import aiohttp
+
+from benchmarks.fake_kinopoisk import WORDS
+from benchmarks.stub_settings import STUB_SETTINGS
+
+
+ENDPOINTS = {
+    'details': 'GET /movies/{id}',
+    'search': 'GET /movies/search',
+    'favorites': 'GET /movies/favorites/',
+    'add': 'POST /movies/favorites/',
+    'delete': 'DELETE /movies/favorites/{kinopoisk_id}',
+}
+DEFAULT_MIX = 'details=50,search=20,favorites=20,add=5,delete=5'
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f'неизвестный эндпоинт {name!r}, доступны: {", ".join(ENDPOINTS)}')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    # ближайший ранг: значение, не меньше которого q процентов наблюдений
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def observe(self, endpoint: str, status: int | str, seconds: float):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][str(status)] += 1
+
+    def report(self, duration: float) -> dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if not (status.startswith('2') or status == '304'))
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': errors,
+                'status_codes': dict(sorted(statuses.items())),
+                'throughput_rps': round(len(latencies) / duration, 2),
+                'latency_ms': {
+                    'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+                    'p50': round(percentile(latencies, 50) * 1000, 3),
+                    'p95': round(percentile(latencies, 95) * 1000, 3),
+                    'p99': round(percentile(latencies, 99) * 1000, 3),
+                    'max': round(latencies[-1] * 1000, 3),
+                },
+            }
+        requests = sum(item['requests'] for item in endpoints.values())
+        return {
+            'totals': {
+                'requests': requests,
+                'errors': sum(item['errors'] for item in endpoints.values()),
+                'throughput_rps': round(requests / duration, 2),
+            },
+            'endpoints': endpoints,
+        }
+
+
+class VirtualUser:
+    """Один пользователь API со своей cookie авторизации и своим списком избранного"""
+
+    def __init__(self, base_url: str, recorder: Recorder, args, rng: random.Random):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.args = args
+        self.rng = rng
+        self.favorites = []
+        # cookie выдается для 127.0.0.1, поэтому нужен unsafe-режим CookieJar
+        self.session = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    async def login(self):
+        credentials = {'user_name': f'bench-{uuid.uuid4().hex[:12]}', 'password': 'bench-password'}
+        async with self.session.post(f'{self.base_url}/auth/register',
+                                     data={**credentials, 'password_repeat': credentials['password']}) as response:
+            await response.read()
+        async with self.session.post(f'{self.base_url}/auth/login', data=credentials) as response:
+            await response.read()
+            if response.status != 200:
+                raise RuntimeError(f'не удалось войти: {response.status}')
+
+    def film_id(self) -> int:
+        # популярные фильмы запрашиваются чаще: распределение с тяжелым хвостом по 1..films
+        return min(self.args.films, int(self.rng.paretovariate(self.args.skew)))
+
+    async def request(self, endpoint: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, f'{self.base_url}{path}', **kwargs) as response:
+                await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        self.recorder.observe(ENDPOINTS[endpoint], status, time.perf_counter() - started)
+        return status
+
+    async def step(self, action: str):
+        if action == 'details':
+            await self.request(action, 'GET', f'/movies/{self.film_id()}')
+        elif action == 'search':
+            keyword = self.rng.choice(WORDS)
+            await self.request(action, 'GET', '/movies/search', params={'keyword': keyword})
+        elif action == 'favorites':
+            await self.request(action, 'GET', '/movies/favorites/', params={'limit': self.args.page_size})
+        elif action == 'add':
+            film_id = self.film_id()
+            status = await self.request(action, 'POST', '/movies/favorites/', params={'id': film_id})
+            if status == 200 and film_id not in self.favorites:
+                self.favorites.append(film_id)
+        elif action == 'delete':
+            if self.favorites:
+                film_id = self.favorites.pop(self.rng.randrange(len(self.favorites)))
+                await self.request(action, 'DELETE', f'/movies/favorites/{film_id}')
+
+    async def run(self, deadline: float, mix: dict):
+        actions, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await self.step(self.rng.choices(actions, weights)[0])
+
+    async def close(self):
+        await self.session.close()
+
+
+async def fetch_json(url: str) -> dict | None:
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f'процесс {process.args} завершился с кодом {process.returncode}')
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f'{url} не ответил за {timeout} с')
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def spawn_environment(args) -> list:
+    """Запускает замену API Кинопоиска, готовит БД и запускает приложение; возвращает процессы"""
+    from benchmarks.db_fixture import prepare_database
+
+    fake_url = f'http://127.0.0.1:{args.fake_port}'
+    fake = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.fake_kinopoisk', '--port', str(args.fake_port),
+        '--films', str(args.films), '--latency', str(args.latency), '--error-rate', str(args.error_rate),
+        '--rate-limit-rate', str(args.rate_limit_rate),
+    ])
+    processes = [fake]
+    try:
+        await wait_until_ready(f'{fake_url}/stats', fake)
+        await prepare_database(args.db_url, args.catalog_films)
+
+        env = {
+            **STUB_SETTINGS,
+            'REFRESH_ENABLED': 'false',
+            **os.environ,
+            'DATABASE_URL': args.db_url,
+            'KINOPOISK_BASE_URL': fake_url,
+        }
+        app = subprocess.Popen([
+            sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(args.app_port),
+            '--log-level', 'warning', '--no-access-log',
+        ], env=env)
+        processes.append(app)
+        await wait_until_ready(f'http://127.0.0.1:{args.app_port}/docs', app)
+    except BaseException:
+        stop_processes(processes)
+        raise
+    args.base_url = f'http://127.0.0.1:{args.app_port}'
+    args.fake_url = fake_url
+    return processes
+
+
+def stop_processes(processes: list):
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run(args) -> dict:
+    processes = await spawn_environment(args) if args.spawn else []
+    try:
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+        users = [VirtualUser(args.base_url, recorder, args, random.Random(rng.random())) for _ in range(args.concurrency)]
+        try:
+            await asyncio.gather(*(user.login() for user in users))
+            upstream_before = await fetch_json(f'{args.fake_url}/stats') if args.fake_url else None
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user.run(started + args.duration, args.mix) for user in users))
+            duration = time.perf_counter() - started
+
+            upstream_after = await fetch_json(f'{args.fake_url}/stats') if args.fake_url else None
+        finally:
+            await asyncio.gather(*(user.close() for user in users))
+    finally:
+        stop_processes(processes)
+
+    result = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'config': {
+            'base_url': args.base_url,
+            'spawn': args.spawn,
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+            'mix': args.mix,
+            'films': args.films,
+            'skew': args.skew,
+            'page_size': args.page_size,
+            'seed': args.seed,
+            **({'db_url': args.db_url, 'latency': args.latency, 'error_rate': args.error_rate,
+                'rate_limit_rate': args.rate_limit_rate, 'catalog_films': args.catalog_films} if args.spawn else {}),
+        },
+        'duration': round(duration, 3),
+        **recorder.report(duration),
+    }
+    if upstream_after is not None:
+        # запросы к замене API Кинопоиска за время теста, без регистрации и входа
+        before = upstream_before or {}
+        result['upstream'] = {key: value - before.get(key, 0) for key, value in upstream_after.items()}
+    return result
+
+
+def print_summary(result: dict):
+    totals = result['totals']
+    print(f"длительность: {result['duration']} с, запросов: {totals['requests']}, ошибок: {totals['errors']}, "
+          f"{totals['throughput_rps']} запр/с")
+    print(f"{'эндпоинт':<42}{'запр/с':>10}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for endpoint, item in result['endpoints'].items():
+        latency = item['latency_ms']
+        print(f"{endpoint:<42}{item['throughput_rps']:>10}{item['errors']:>8}"
+              f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}")
+    if 'upstream' in result:
+        print(f"запросы к API Кинопоиска: {result['upstream']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный тест API')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='адрес запущенного приложения')
+    parser.add_argument('--fake-url', default=None, help='адрес fake_kinopoisk для статистики запросов к API')
+    parser.add_argument('--duration', type=float, default=30, help='длительность теста, с')
+    parser.add_argument('--concurrency', type=int, default=20, help='число виртуальных пользователей')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'веса запросов, по умолчанию {DEFAULT_MIX}')
+    parser.add_argument('--films', type=int, default=10000, help='id фильмов в запросах: 1..N')
+    parser.add_argument('--skew', type=float, default=1.2,
+                        help='параметр распределения Парето для id фильмов; меньше - популярнее первые id')
+    parser.add_argument('--page-size', type=int, default=20, help='limit для списка избранного')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load_test.json', help='файл для результата в JSON')
+
+    spawn = parser.add_argument_group('окружение для --spawn')
+    spawn.add_argument('--spawn', action='store_true', help='запустить fake_kinopoisk, БД и приложение')
+    spawn.add_argument('--app-port', type=int, default=8000)
+    spawn.add_argument('--fake-port', type=int, default=8081)
+    spawn.add_argument('--db-url', default='sqlite+aiosqlite:///bench.db')
+    spawn.add_argument('--catalog-films', type=int, default=1000, help='фильмов в каталоге БД перед тестом')
+    spawn.add_argument('--latency', type=float, default=0.05, help='задержка ответа API Кинопоиска, с')
+    spawn.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 500 от API Кинопоиска')
+    spawn.add_argument('--rate-limit-rate', type=float, default=0.0, help='доля ответов 429 от API Кинопоиска')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print_summary(result)
+    print(f'результат записан в {args.output}')
+
+
+if __name__ == '__main__':
+    main()
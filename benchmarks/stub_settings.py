@@ -0,0 +1,20 @@
+"""
+Заглушки обязательных настроек приложения для бенчмарков и тестов
+
+app.config при импорте требует параметры БД, SECRET_KEY и API_key; скриптам, которые
+не обращаются к рабочей БД и настоящему API Кинопоиска, хватает любых значений.
+apply() нужно вызвать до первого импорта app.*; уже заданные переменные окружения
+не перезаписываются.
+"""
+import os
+
+
+STUB_SETTINGS = {
+    'DB_HOST': 'localhost', 'DB_PORT': '5432', 'DB_USER': 'stub', 'DB_PASS': 'stub',
+    'DB_NAME': 'stub', 'SECRET_KEY': 'stub-secret', 'API_key': 'stub', 'LOG_LEVEL': 'WARNING',
+}
+
+
+def apply():
+    for name, value in STUB_SETTINGS.items():
+        os.environ.setdefault(name, value)
@@ -0,0 +1,72 @@
+import time
+
+from benchmarks import stub_settings
+
+# настройки приложения обязательны при импорте app.config; для тестов хватает заглушек
+stub_settings.apply()
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, sqlite_unicode_lower
+import app.movies.models  # noqa: F401 - регистрирует таблицы каталога и избранного в Base.metadata
+import app.users.models  # noqa: F401
+from app.dao.dependencies import get_db_session
+from app.movies.dao import UsersDAO
+from app.movies.dependencies import get_client_session
+from app.users.dependencies import get_current_user
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время для time.monotonic: clock[0] += секунды"""
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+async def session(tmp_path):
+    """Сессия SQLite с пустыми таблицами приложения и тем же lower(), что у движка приложения"""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+    event.listen(engine.sync_engine, 'connect', sqlite_unicode_lower)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+async def user(session):
+    return await UsersDAO.add(session, user_name='alice', password='hash')
+
+
+@pytest.fixture
+async def api_client(session, user):
+    """
+    HTTP-клиент приложения: запросы выполняются от имени user, с сессией SQLite вместо
+    рабочей БД; сессия aiohttp не создается, обращения к API Кинопоиска тест подменяет сам
+    """
+    from app.main import app
+
+    async def get_test_session():
+        yield session
+
+    app.dependency_overrides.update({
+        get_current_user: lambda: user,
+        get_client_session: lambda: None,
+        get_db_session: get_test_session,
+    })
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+    app.dependency_overrides.clear()
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.exceptions import IncorrectFormatTokenException, PasswordHashBusyException, TokenExpiredException
+from app.users import auth, dependencies
+from app.users.auth import create_access_token
+from app.users.cache import invalidate_user, token_cache, user_cache
+from app.users.dao import UsersDAO
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    user_cache.clear()
+    token_cache.clear()
+    yield
+    user_cache.clear()
+    token_cache.clear()
+
+
+@pytest.fixture
+def user_lookups(session, monkeypatch):
+    """Подключает get_current_user к тестовой БД; возвращает список id, прочитанных из БД"""
+    lookups = []
+    find_by_id = UsersDAO.find_by_id
+
+    async def counting_find_by_id(user_id, db_session):
+        lookups.append(user_id)
+        return await find_by_id(user_id, db_session)
+
+    @asynccontextmanager
+    async def session_maker():
+        yield session
+
+    monkeypatch.setattr(dependencies, 'async_session_maker', session_maker)
+    monkeypatch.setattr(dependencies.UsersDAO, 'find_by_id', counting_find_by_id)
+    return lookups
+
+
+async def test_user_is_cached_until_invalidated(user, user_lookups):
+    token = create_access_token({'sub': str(user.id)})
+
+    assert (await dependencies.get_current_user(token)).id == user.id
+    assert (await dependencies.get_current_user(token)).id == user.id
+    assert user_lookups == [user.id]
+
+    invalidate_user(user.id)
+    await dependencies.get_current_user(token)
+    assert user_lookups == [user.id, user.id]
+
+
+def test_verified_token_is_not_decoded_again(monkeypatch):
+    token = create_access_token({'sub': '7'})
+    decoded = []
+    decode = dependencies.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decoded.append(args[0])
+        return decode(*args, **kwargs)
+    monkeypatch.setattr(dependencies.jwt, 'decode', counting_decode)
+
+    assert dependencies.decode_token(token) == 7
+    assert dependencies.decode_token(token) == 7
+    assert decoded == [token]
+
+
+def test_cached_token_still_expires():
+    token = create_access_token({'sub': '7'})
+    dependencies.decode_token(token)
+    key = hashlib.sha256(token.encode()).digest()
+    token_cache.set(key, (7, int(time.time()) - 1))
+
+    with pytest.raises(HTTPException) as error:
+        dependencies.decode_token(token)
+    assert error.value is TokenExpiredException
+
+
+def test_invalid_token_is_not_cached():
+    with pytest.raises(HTTPException) as error:
+        dependencies.decode_token('not-a-jwt')
+    assert error.value is IncorrectFormatTokenException
+    assert len(token_cache) == 0
+
+
+@pytest.fixture
+def fast_bcrypt(monkeypatch):
+    # минимальная стоимость bcrypt, чтобы тесты не тратили время на хеширование
+    context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=5)
+    monkeypatch.setattr(auth, 'pwd_context', context)
+    return context
+
+
+async def test_password_hashing_runs_off_the_event_loop(fast_bcrypt):
+    assert await auth._run_password_task(lambda: threading.current_thread().name) != threading.current_thread().name
+    hashed = await auth.get_password_hash('secret')
+    assert await auth.verify_password('secret', hashed) == (True, None)
+    assert (await auth.verify_password('wrong', hashed))[0] is False
+
+
+async def test_password_is_rehashed_when_cost_changes(session, fast_bcrypt):
+    old_hash = CryptContext(schemes=['bcrypt'], bcrypt__rounds=4).hash('secret')
+    user = await UsersDAO.add(session, user_name='bob', password=old_hash)
+    user_cache.set(user.id, user)
+
+    authenticated = await auth.authenticate_user(session, 'bob', 'secret')
+
+    assert authenticated.id == user.id
+    stored = (await UsersDAO.find_by_id(user.id, session)).password
+    assert stored != old_hash and fast_bcrypt.verify('secret', stored)
+    assert not fast_bcrypt.needs_update(stored)
+    assert user.id not in user_cache
+    assert await auth.authenticate_user(session, 'bob', 'wrong') is None
+
+
+async def test_password_hashing_rejects_when_busy(monkeypatch):
+    monkeypatch.setattr(auth, '_password_slots', asyncio.Semaphore(0))
+    monkeypatch.setattr(auth.settings, 'PASSWORD_HASH_QUEUE_TIMEOUT', 0.01)
+
+    with pytest.raises(HTTPException) as error:
+        await auth.get_password_hash('secret')
+    assert error.value is PasswordHashBusyException
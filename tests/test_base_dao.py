@@ -0,0 +1,43 @@
+import pytest
+
+from app.movies.dao import CatalogDAO, FilmsDAO, UsersDAO
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_add_returns_inserted_row(session):
+    user = await UsersDAO.add(session, user_name='alice', password='hash')
+    assert user.id is not None
+    assert (await UsersDAO.find_by_id(user.id, session)).user_name == 'alice'
+
+
+async def test_add_many_returns_rows_and_respects_commit(session):
+    users = await UsersDAO.add_many(session, [
+        {'user_name': 'alice', 'password': 'hash'},
+        {'user_name': 'bob', 'password': 'hash'},
+    ])
+    assert [user.user_name for user in users] == ['alice', 'bob']
+    assert all(user.id is not None for user in users)
+
+    await UsersDAO.add_many(session, [{'user_name': 'carol', 'password': 'hash'}], commit=False)
+    await session.rollback()
+    assert await UsersDAO.find_one_or_none(session, user_name='carol') is None
+    assert await UsersDAO.add_many(session, []) == []
+
+
+async def test_add_if_absent_skips_existing_rows(session):
+    user = await UsersDAO.add(session, user_name='alice', password='hash')
+    film_ids = await CatalogDAO.save_many([
+        {'kinopoisk_id': 1, 'film_name': 'Фильм 1', 'description': ''},
+        {'kinopoisk_id': 2, 'film_name': 'Фильм 2', 'description': ''},
+    ], session)
+
+    first = await FilmsDAO.add_if_absent(session, ['user_id', 'film_id'], user_id=user.id, film_id=film_ids[1])
+    again = await FilmsDAO.add_if_absent(session, ['user_id', 'film_id'], user_id=user.id, film_id=film_ids[1])
+    assert first is not None and again is None
+
+    added = await FilmsDAO.add_many_if_absent(session, ['user_id', 'film_id'], [
+        {'user_id': user.id, 'film_id': film_ids[1]},
+        {'user_id': user.id, 'film_id': film_ids[2]},
+    ])
+    assert [favorite.film_id for favorite in added] == [film_ids[2]]
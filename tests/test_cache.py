@@ -0,0 +1,81 @@
+import gzip
+
+from app import cache as cache_module
+from app.cache import Payload, TTLCache
+
+
+def test_get_returns_value_until_ttl(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.set('a', 1)
+    clock[0] += 59
+    assert cache.get('a') == 1
+    clock[0] += 1
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_stale_entry_is_served_within_stale_ttl(clock):
+    cache = TTLCache(max_entries=10, ttl=10, stale_ttl=5)
+    cache.set('a', 1)
+    clock[0] += 12
+    entry = cache.get_entry('a')
+    assert entry.value == 1 and entry.is_stale
+    clock[0] += 3
+    assert cache.get_entry('a') is None
+    assert cache.peek('a').value == 1
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_lru_eviction_by_entries():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_by_bytes_and_oversized_values():
+    cache = TTLCache(max_entries=10, ttl=60, max_bytes=10)
+    cache.set('a', 'x', size=6)
+    cache.set('b', 'y', size=6)
+    assert 'a' not in cache and cache.stats()['bytes'] == 6
+    cache.set('c', 'z', size=11)
+    assert 'c' not in cache
+
+
+def test_set_keeps_hits_and_replaces_size():
+    cache = TTLCache(max_entries=10, ttl=60, max_bytes=100)
+    cache.set('a', 1, size=10)
+    cache.get('a')
+    cache.get('a')
+    cache.set('a', 2, size=30)
+    assert cache.peek('a').hits == 2
+    assert cache.stats()['bytes'] == 30
+
+
+def test_expiring_lists_entries_close_to_ttl(clock):
+    cache = TTLCache(max_entries=10, ttl=100, stale_ttl=50)
+    cache.set('soon', 1, ttl=10)
+    cache.set('later', 2)
+    clock[0] += 5
+    assert [key for key, _ in cache.expiring(10)] == ['soon']
+    clock[0] += 100
+    assert [key for key, _ in cache.expiring(10)] == ['later']
+
+
+def test_payload_compressed_variants_are_bounded_separately(monkeypatch):
+    encoded = TTLCache(max_entries=10, ttl=60, max_bytes=200)
+    monkeypatch.setattr(cache_module, 'encoded_cache', encoded)
+    payloads = [Payload(f'{{"id": {i}, "text": "{"ф" * 100 * (i + 1)}"}}'.encode()) for i in range(5)]
+
+    for payload in payloads:
+        assert gzip.decompress(payload.encoded('gzip')) == payload.body
+    assert encoded.stats()['bytes'] <= 200
+    assert encoded.stats()['evictions'] > 0
+
+    # повторный запрос берет сжатое тело из кеша
+    assert payloads[-1].encoded('gzip') is payloads[-1].encoded('gzip')
+    assert encoded.stats()['hits'] == 2
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.kinopoisk.api import normalize_keyword
+from app.movies.dao import CatalogDAO
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def catalog(session):
+    await CatalogDAO.save_many([
+        {'kinopoisk_id': 301, 'film_name': 'Матрица', 'description': 'Хакер узнает правду о мире'},
+        {'kinopoisk_id': 302, 'film_name': 'Matrix Reloaded', 'description': 'Продолжение'},
+        {'kinopoisk_id': 303, 'film_name': 'Брат', 'description': 'Фильм о матрице и о брате'},
+        {'kinopoisk_id': 304, 'film_name': '100% любовь', 'description': 'Комедия'},
+    ], session)
+    return session
+
+
+@pytest.mark.parametrize('keyword', ['Матрица', 'матрица', 'МАТРИЦА'])
+async def test_search_cyrillic_ignores_case(catalog, keyword):
+    films = await CatalogDAO.search(normalize_keyword(keyword), 10, catalog)
+    assert [film['filmId'] for film in films] == [301]
+
+
+async def test_search_ranks_title_matches_first(catalog):
+    films = await CatalogDAO.search(normalize_keyword('матриц'), 10, catalog)
+    assert [film['filmId'] for film in films] == [301, 303]
+
+
+async def test_search_requires_all_terms(catalog):
+    films = await CatalogDAO.search(normalize_keyword('matrix reloaded'), 10, catalog)
+    assert films == [{'filmId': 302, 'nameRu': 'Matrix Reloaded', 'description': 'Продолжение'}]
+    assert await CatalogDAO.search(normalize_keyword('matrix брат'), 10, catalog) == []
+
+
+async def test_search_escapes_like_wildcards(catalog):
+    assert [film['filmId'] for film in await CatalogDAO.search('100%', 10, catalog)] == [304]
+    assert await CatalogDAO.search('_', 10, catalog) == []
+
+
+async def test_search_limit_and_empty_keyword(catalog):
+    assert len(await CatalogDAO.search('м', 1, catalog)) == 1
+    assert await CatalogDAO.search('  ', 10, catalog) == []
+
+
+async def test_lower_override_applies_only_to_registered_engines(session, tmp_path):
+    # обработчик подключен к движку приложения и к движку фикстуры, но не к любому движку SQLite
+    other = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "other.db"}')
+    try:
+        async with other.connect() as conn:
+            assert (await conn.execute(text("SELECT lower('МАТРИЦА')"))).scalar() == 'МАТРИЦА'
+    finally:
+        await other.dispose()
+    assert (await session.execute(text("SELECT lower('МАТРИЦА')"))).scalar() == 'матрица'
@@ -0,0 +1,82 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from app.compression import SUPPORTED_ENCODINGS, CompressionMiddleware, choose_encoding
+from app.monitoring.metrics import http_requests_total
+from app.monitoring.middleware import MetricsMiddleware
+from app.responses import etag_matches, make_etag, not_modified
+
+
+ROUTE = '/compression-test/{item_id}'
+
+
+def make_app() -> FastAPI:
+    # middleware в том же порядке, что в app.main: сжатие внутри MetricsMiddleware
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get(ROUTE)
+    async def get_item(request: Request, item_id: int, size: int = 500):
+        etag = make_etag(item_id, size)
+        if etag_matches(request, etag):
+            return not_modified(etag, 'no-cache')
+        return ORJSONResponse({'id': item_id, 'text': 'ф' * size}, headers={'ETag': etag})
+
+    return app
+
+
+def requests_count(route: str) -> int:
+    return sum(value for (_, label, _), value in http_requests_total._values.items() if label == route)
+
+
+def test_choose_encoding():
+    assert choose_encoding(None) is None
+    assert choose_encoding('identity') is None
+    assert choose_encoding('gzip;q=0, identity') is None
+    assert choose_encoding('gzip, deflate') == 'gzip'
+    assert choose_encoding('*') == SUPPORTED_ENCODINGS[0]
+
+
+def test_compressed_response_keeps_route_label():
+    client = TestClient(make_app())
+    route_before, unmatched_before = requests_count(ROUTE), requests_count('unmatched')
+
+    response = client.get('/compression-test/1', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert response.json()['id'] == 1
+    assert requests_count(ROUTE) == route_before + 1
+    assert requests_count('unmatched') == unmatched_before
+
+
+def test_small_and_identity_responses_are_not_compressed():
+    client = TestClient(make_app())
+
+    small = client.get('/compression-test/1', params={'size': 1}, headers={'Accept-Encoding': 'gzip'})
+    identity = client.get('/compression-test/1', headers={'Accept-Encoding': 'identity'})
+
+    assert 'content-encoding' not in small.headers
+    assert 'content-encoding' not in identity.headers
+    assert identity.headers['etag'] == make_etag(1, 500)
+
+
+def test_compressed_representation_has_own_etag_on_200_and_304():
+    client = TestClient(make_app())
+    plain_etag = make_etag(1, 500)
+
+    response = client.get('/compression-test/1', headers={'Accept-Encoding': 'gzip'})
+    etag = response.headers['etag']
+    assert etag == plain_etag[:-1] + '-gzip"'
+
+    cached = client.get('/compression-test/1', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['etag'] == etag
+
+    # тег сжатого представления не подходит к несжатому
+    identity = client.get('/compression-test/1', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert identity.status_code == 200
+    assert identity.headers['etag'] == plain_etag
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from app.cache import Payload
+from app.compression import encoded_etag
+from app.movies import router as movies_router
+from app.movies.dao import CatalogDAO, FilmsDAO, UsersDAO
+
+pytestmark = pytest.mark.anyio
+
+IDENTITY = {'Accept-Encoding': 'identity'}
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def film(monkeypatch):
+    body = json.dumps({'kinopoiskId': 1, 'nameRu': 'Фильм', 'description': 'Описание ' * 200}).encode()
+    payload = Payload(body)
+
+    async def get_film_details_payload(session, film_id):
+        return payload
+    monkeypatch.setattr(movies_router, 'get_film_details_payload', get_film_details_payload)
+    return payload
+
+
+async def test_film_details_not_modified(api_client, film):
+    response = await api_client.get('/movies/1', headers=IDENTITY)
+    assert response.status_code == 200
+    assert response.headers['etag'] == film.etag
+    assert response.headers['cache-control'].startswith('private, max-age=')
+    assert response.content == film.body
+
+    for tag in (film.etag, f'W/{film.etag}', f'"other", {film.etag}', '*'):
+        cached = await api_client.get('/movies/1', headers={**IDENTITY, 'If-None-Match': tag})
+        assert cached.status_code == 304
+        assert cached.headers['etag'] == film.etag
+        assert cached.content == b''
+
+    changed = await api_client.get('/movies/1', headers={**IDENTITY, 'If-None-Match': '"other"'})
+    assert changed.status_code == 200
+
+
+async def test_film_details_compressed_representation(api_client, film):
+    response = await api_client.get('/movies/1', headers=GZIP)
+    etag = encoded_etag(film.etag, 'gzip')
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['etag'] == etag
+    assert response.content == film.body
+
+    cached = await api_client.get('/movies/1', headers={**GZIP, 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['etag'] == etag
+
+    # тег несжатого представления не подходит к сжатому
+    other = await api_client.get('/movies/1', headers={**GZIP, 'If-None-Match': film.etag})
+    assert other.status_code == 200
+
+
+async def test_favorites_etag_follows_favorites_version(api_client, session, user):
+    film_ids = await CatalogDAO.save_many([
+        {'kinopoisk_id': 1, 'film_name': 'Фильм 1', 'description': ''},
+        {'kinopoisk_id': 2, 'film_name': 'Фильм 2', 'description': ''},
+    ], session)
+    await FilmsDAO.add_favorite(user.id, film_ids[1], session)
+
+    first = await api_client.get('/movies/favorites/')
+    etag = first.headers['etag']
+    assert first.headers['cache-control'] == 'private, no-cache'
+    assert (await api_client.get('/movies/favorites/', headers={'If-None-Match': etag})).status_code == 304
+
+    # другая страница или другой набор полей - другой ETag
+    assert (await api_client.get('/movies/favorites/', params={'limit': 1})).headers['etag'] != etag
+    assert (await api_client.get('/movies/favorites/', params={'fields': 'kinopoisk_id'})).headers['etag'] != etag
+
+    await FilmsDAO.add_favorite(user.id, film_ids[2], session)
+    added = await api_client.get('/movies/favorites/', headers={'If-None-Match': etag})
+    assert added.status_code == 200
+    assert [film['kinopoisk_id'] for film in added.json()] == [1, 2]
+
+    # обновление данных фильма в каталоге меняет версию у всех, у кого он в избранном
+    etag = added.headers['etag']
+    await UsersDAO.bump_favorites_version(session, film_ids=[film_ids[1]])
+    await session.commit()
+    assert (await api_client.get('/movies/favorites/', headers={'If-None-Match': etag})).status_code == 200
@@ -0,0 +1,54 @@
+import pytest
+
+from app.movies.dao import CatalogDAO, FilmsDAO, UsersDAO
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def favorites(session):
+    user = await UsersDAO.add(session, user_name='alice', password='hash')
+    other = await UsersDAO.add(session, user_name='bob', password='hash')
+    film_ids = await CatalogDAO.save_many([
+        {'kinopoisk_id': 100 + i, 'film_name': f'Фильм {i}', 'description': f'Описание {i}'} for i in range(5)
+    ], session)
+    await FilmsDAO.add_many(session, [{'user_id': user.id, 'film_id': film_ids[100 + i]} for i in range(5)])
+    await FilmsDAO.add_many(session, [{'user_id': other.id, 'film_id': film_ids[100]}])
+    return session, user.id
+
+
+async def test_pages_follow_cursor(favorites):
+    session, user_id = favorites
+    fields = FilmsDAO.PAGE_FIELDS
+    page, cursor = await FilmsDAO.get_page(user_id, session, fields, None, 2)
+    assert [film['kinopoisk_id'] for film in page] == [100, 101]
+    assert cursor == page[-1]['id']
+
+    page, cursor = await FilmsDAO.get_page(user_id, session, fields, cursor, 2)
+    assert [film['kinopoisk_id'] for film in page] == [102, 103]
+
+    page, cursor = await FilmsDAO.get_page(user_id, session, fields, cursor, 2)
+    assert [film['kinopoisk_id'] for film in page] == [104]
+    assert cursor is None
+
+
+async def test_exact_last_page_has_no_cursor(favorites):
+    session, user_id = favorites
+    page, cursor = await FilmsDAO.get_page(user_id, session, ['id'], None, 5)
+    assert len(page) == 5
+    assert cursor is None
+
+
+async def test_only_requested_fields_are_returned(favorites):
+    session, user_id = favorites
+    page, _ = await FilmsDAO.get_page(user_id, session, ['user_id'], None, 10)
+    assert page == [{'user_id': user_id}] * 5
+
+    page, _ = await FilmsDAO.get_page(user_id, session, ['film_name', 'description'], None, 1)
+    assert page == [{'film_name': 'Фильм 0', 'description': 'Описание 0'}]
+
+
+async def test_other_users_favorites_are_excluded(favorites):
+    session, user_id = favorites
+    page, _ = await FilmsDAO.get_page(user_id + 1, session, ['kinopoisk_id'], None, 10)
+    assert page == [{'kinopoisk_id': 100}]
@@ -0,0 +1,68 @@
+import pytest
+
+from app.kinopoisk.api import KinopoiskStatusError
+from app.movies.dao import CatalogDAO, FilmsDAO
+from app.movies.favorites import router as favorites_router
+
+pytestmark = pytest.mark.anyio
+
+
+def fail_with(status: int):
+    async def get_film_details(session, film_id, *args):
+        raise KinopoiskStatusError(status)
+    return get_film_details
+
+
+@pytest.mark.parametrize('upstream_status, expected', [
+    (404, 404),
+    (401, 502),
+    (500, 502),
+    (402, 503),
+])
+async def test_add_favorite_upstream_status(api_client, monkeypatch, upstream_status, expected):
+    monkeypatch.setattr(favorites_router, 'get_film_details', fail_with(upstream_status))
+
+    response = await api_client.post('/movies/favorites/', params={'id': 1})
+
+    assert response.status_code == expected
+
+
+async def test_batch_add_reports_status_per_id(api_client, session, user, monkeypatch):
+    film_ids = await CatalogDAO.save_many([
+        {'kinopoisk_id': 1, 'film_name': 'В каталоге', 'description': ''},
+        {'kinopoisk_id': 2, 'film_name': 'Уже в избранном', 'description': ''},
+    ], session)
+    await FilmsDAO.add_favorite(user.id, film_ids[2], session)
+    requested = []
+
+    async def get_film_details(session, film_id, *args):
+        requested.append(film_id)
+        if film_id == 3:
+            return {'kinopoiskId': 3, 'nameRu': 'Новый фильм', 'description': 'Описание'}
+        if film_id == 6:
+            raise ValueError('ответ 200 не в JSON')
+        raise KinopoiskStatusError(404 if film_id == 4 else 500)
+    monkeypatch.setattr(favorites_router, 'get_film_details', get_film_details)
+
+    response = await api_client.post('/movies/favorites/batch', json={'ids': [1, 2, 3, 4, 5, 6, 3]})
+
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'id': 1, 'status': 'added'},
+        {'id': 2, 'status': 'exists'},
+        {'id': 3, 'status': 'added'},
+        {'id': 4, 'status': 'not_found'},
+        {'id': 5, 'status': 'error'},
+        {'id': 6, 'status': 'error'},
+    ]
+    # фильмы из каталога и уже добавленные не запрашиваются у API, повторный id - один раз
+    assert sorted(requested) == [3, 4, 5, 6]
+    assert await FilmsDAO.get_kinopoisk_ids(user.id, [1, 2, 3, 4, 5, 6], session) == {1, 2, 3}
+
+
+async def test_batch_add_rejects_too_many_ids(api_client, monkeypatch):
+    monkeypatch.setattr(favorites_router.settings, 'FAVORITES_BATCH_MAX_SIZE', 2)
+
+    response = await api_client.post('/movies/favorites/batch', json={'ids': [1, 2, 3]})
+
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+import logging
+import time
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+from app.kinopoisk import api
+from app.kinopoisk.keys import ApiKeyPool, NoApiKeyAvailable
+from app.kinopoisk.limiter import TokenBucketLimiter
+from benchmarks.fake_kinopoisk import FakeConfig, create_app
+
+
+SECRET = 'secret-api-key-value'
+
+
+def test_acquire_prefers_key_with_most_quota_left():
+    pool = ApiKeyPool(['first-key-value', 'second-key-value'], daily_quota=10, unauthorized_cooldown=60)
+    first = pool.acquire()
+    pool.release(first, 200)
+    second = pool.acquire()
+    assert second is not first
+    pool.release(second, 200)
+    assert [key['used_today'] for key in pool.stats()] == [1, 1]
+
+
+def test_unauthorized_and_exhausted_keys_are_skipped(clock):
+    pool = ApiKeyPool(['first-key-value', 'second-key-value'], daily_quota=10, unauthorized_cooldown=60)
+    first = pool.acquire()
+    pool.release(first, 401)
+    second = pool.acquire()
+    pool.release(second, 402)
+    assert second.remaining == 0
+    with pytest.raises(NoApiKeyAvailable):
+        pool.acquire()
+
+    clock[0] += 60
+    assert pool.acquire() is first
+
+
+def test_stats_do_not_expose_key_values():
+    pool = ApiKeyPool([SECRET, 'another-secret-value'], daily_quota=10, unauthorized_cooldown=60)
+    stats = pool.stats()
+    assert [key['key'] for key in stats] == ['key-1', 'key-2']
+    assert SECRET[:4] not in repr(stats)
+
+
+@pytest.mark.anyio
+async def test_throttled_key_is_logged_by_label(monkeypatch, caplog):
+    monkeypatch.setattr(api, 'api_key_pool', ApiKeyPool([SECRET], daily_quota=10, unauthorized_cooldown=60))
+    # 429 без свободных ключей приостанавливает лимитер; общий лимитер приложения не трогаем
+    monkeypatch.setattr(api, 'kinopoisk_limiter', TokenBucketLimiter(rate=1, burst=1, max_queue=1, max_wait=1))
+    server = TestServer(create_app(FakeConfig(latency=0, rate_limit_rate=1.0)))
+    await server.start_server()
+    try:
+        async with aiohttp.ClientSession() as session:
+            with caplog.at_level(logging.WARNING), pytest.raises(api.UpstreamThrottled):
+                await api._request(session, str(server.make_url('/api/v2.2/films/1')), 'film', time.monotonic() + 5)
+    finally:
+        await server.close()
+
+    assert 'key-1' in caplog.text
+    assert SECRET[:4] not in caplog.text
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.kinopoisk.limiter import Priority, RateLimitExceeded, TokenBucketLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_full_queue_evicts_lowest_priority_latest_waiter():
+    limiter = TokenBucketLimiter(rate=50, burst=1, max_queue=3, max_wait=5)
+    await limiter.acquire()
+    bulk = asyncio.ensure_future(limiter.acquire(Priority.BULK))
+    background_first = asyncio.ensure_future(limiter.acquire(Priority.BACKGROUND))
+    background_last = asyncio.ensure_future(limiter.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+
+    interactive = asyncio.ensure_future(limiter.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    with pytest.raises(RateLimitExceeded):
+        await background_last
+    assert limiter.queue_depth == 3
+
+    await asyncio.gather(interactive, bulk, background_first)
+    assert limiter.rejected == 1
+
+
+async def test_full_queue_rejects_caller_without_higher_priority():
+    limiter = TokenBucketLimiter(rate=50, burst=1, max_queue=2, max_wait=5)
+    await limiter.acquire()
+    waiters = [asyncio.ensure_future(limiter.acquire(Priority.INTERACTIVE)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(RateLimitExceeded):
+        await limiter.acquire(Priority.BULK)
+    with pytest.raises(RateLimitExceeded):
+        await limiter.acquire(Priority.INTERACTIVE)
+    await asyncio.gather(*waiters)
+
+
+async def test_burst_then_rate():
+    limiter = TokenBucketLimiter(rate=20, burst=3, max_queue=10, max_wait=5)
+    for _ in range(3):
+        assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await limiter.acquire()
+    assert 0.02 <= loop.time() - started < 0.5
+
+
+async def test_queue_is_served_by_priority():
+    limiter = TokenBucketLimiter(rate=50, burst=1, max_queue=10, max_wait=5)
+    await limiter.acquire()
+    order = []
+
+    async def acquire(priority, name):
+        await limiter.acquire(priority)
+        order.append(name)
+
+    tasks = [
+        asyncio.ensure_future(acquire(Priority.BACKGROUND, 'background')),
+        asyncio.ensure_future(acquire(Priority.BULK, 'bulk')),
+        asyncio.ensure_future(acquire(Priority.INTERACTIVE, 'interactive')),
+    ]
+    await asyncio.gather(*tasks)
+    assert order == ['interactive', 'bulk', 'background']
+
+
+async def test_wait_is_capped_by_timeout():
+    limiter = TokenBucketLimiter(rate=0.1, burst=1, max_queue=10, max_wait=5)
+    await limiter.acquire()
+    with pytest.raises(RateLimitExceeded):
+        await limiter.acquire(timeout=0.05)
+    with pytest.raises(RateLimitExceeded):
+        await limiter.acquire(timeout=0)
+    assert limiter.stats()['timeouts'] == 2
+
+
+async def test_penalize_blocks_tokens():
+    limiter = TokenBucketLimiter(rate=1000, burst=5, max_queue=10, max_wait=5)
+    limiter.penalize(0.1)
+    assert not limiter.try_acquire()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await limiter.acquire()
+    assert loop.time() - started >= 0.09
@@ -0,0 +1,33 @@
+import logging
+
+from app.logger import WarningSampler
+
+
+def record(level: int = logging.WARNING, lineno: int = 10) -> logging.LogRecord:
+    return logging.LogRecord('test', level, 'app/module.py', lineno, 'сообщение', None, None)
+
+
+def test_repeated_warnings_are_sampled_per_call_site(clock):
+    sampler = WarningSampler(limit=2, window=60)
+
+    assert [sampler.filter(record()) for _ in range(4)] == [True, True, False, False]
+    # другое место вызова считается отдельно
+    assert sampler.filter(record(lineno=20))
+
+    clock[0] += 60
+    passed = record()
+    assert sampler.filter(passed)
+    assert passed.suppressed == 2
+
+
+def test_errors_and_info_are_not_sampled():
+    sampler = WarningSampler(limit=1, window=60)
+    assert sampler.filter(record())
+    assert not sampler.filter(record())
+    assert all(sampler.filter(record(logging.ERROR)) for _ in range(3))
+    assert all(sampler.filter(record(logging.INFO)) for _ in range(3))
+
+
+def test_zero_limit_disables_sampling():
+    sampler = WarningSampler(limit=0, window=60)
+    assert all(sampler.filter(record()) for _ in range(5))
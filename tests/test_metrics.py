@@ -0,0 +1,38 @@
+import pytest
+
+from app.monitoring.metrics import Counter, Histogram, Registry
+
+pytestmark = pytest.mark.anyio
+
+
+def test_render_counter_and_histogram():
+    registry = Registry()
+    requests = registry.register(Counter('requests_total', 'Запросы', ('route', )))
+    duration = registry.register(Histogram('duration_seconds', 'Длительность', ('route', ), buckets=(0.1, 1.0)))
+    requests.inc('/a')
+    requests.inc('/a')
+    duration.observe(0.05, '/a')
+    duration.observe(0.5, '/a')
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{route="/a"} 2' in lines
+    assert '# TYPE duration_seconds histogram' in lines
+    assert 'duration_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'duration_seconds_bucket{route="/a",le="+Inf"} 2' in lines
+    assert 'duration_seconds_count{route="/a"} 2' in lines
+
+
+async def test_metrics_endpoint_types(api_client):
+    response = await api_client.get('/metrics', headers={'Accept-Encoding': 'identity'})
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200
+    for field in ('hits', 'stale_hits', 'misses', 'evictions'):
+        assert f'# TYPE cache_{field}_total counter' in lines
+        assert f'# TYPE cache_{field} gauge' not in lines
+    assert '# TYPE cache_entries gauge' in lines
+    assert '# TYPE cache_bytes gauge' in lines
+    assert 'cache_hits_total{cache="film_details"} ' in response.text
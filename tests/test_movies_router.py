@@ -0,0 +1,56 @@
+import pytest
+
+from app.cache import Payload
+from app.kinopoisk.api import KinopoiskStatusError
+from app.movies import router as movies_router
+from app.movies.dao import CatalogDAO
+
+pytestmark = pytest.mark.anyio
+
+
+def fail_with(status: int):
+    async def get_film_details_payload(session, film_id):
+        raise KinopoiskStatusError(status)
+    return get_film_details_payload
+
+
+@pytest.mark.parametrize('upstream_status, expected', [
+    (404, 404),
+    (401, 502),
+    (500, 502),
+    (503, 502),
+    (402, 503),
+])
+async def test_film_details_upstream_status(api_client, monkeypatch, upstream_status, expected):
+    monkeypatch.setattr(movies_router, 'get_film_details_payload', fail_with(upstream_status))
+
+    response = await api_client.get('/movies/1')
+
+    assert response.status_code == expected
+
+
+@pytest.fixture
+async def catalog(session):
+    await CatalogDAO.save_many([
+        {'kinopoisk_id': 100 + i, 'film_name': f'Матрица {i}', 'description': ''} for i in range(5)
+    ], session)
+
+
+async def test_search_defaults_to_upstream(api_client, catalog, monkeypatch):
+    body = '[{"filmId": 1, "nameRu": "Матрица"}]'.encode()
+
+    async def search_films(session, keyword):
+        return Payload(body)
+    monkeypatch.setattr(movies_router, 'search_films', search_films)
+
+    response = await api_client.get('/movies/search', params={'keyword': 'матрица'})
+
+    assert response.headers['x-search-source'] == 'upstream'
+    assert response.content == body
+
+
+async def test_search_local_mode_is_opt_in(api_client, catalog):
+    response = await api_client.get('/movies/search', params={'keyword': 'матрица', 'mode': 'local'})
+
+    assert response.headers['x-search-source'] == 'local'
+    assert len(response.json()) == 5
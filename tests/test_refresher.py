@@ -0,0 +1,112 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+from app.cache import Payload, TTLCache
+from app.kinopoisk.api import KinopoiskStatusError
+from app.kinopoisk.keys import ApiKeyPool
+from app.movies import refresher as refresher_module
+from app.movies.dao import CatalogDAO, FilmsDAO, UsersDAO
+from app.movies.models import Catalog
+from app.movies.refresher import RefreshScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def upstream(session, monkeypatch):
+    """Подменяет БД, кеш, ключи и API Кинопоиска планировщика; возвращает список запрошенных id"""
+    requested = []
+
+    async def refresh_film_details(client_session, film_id):
+        requested.append(film_id)
+        if film_id >= 900:
+            raise KinopoiskStatusError(404)
+        return Payload(json.dumps({'kinopoiskId': film_id, 'nameRu': f'Новое название {film_id}'}).encode())
+
+    @asynccontextmanager
+    async def session_maker():
+        yield session
+
+    monkeypatch.setattr(refresher_module, 'refresh_film_details', refresh_film_details)
+    monkeypatch.setattr(refresher_module, 'kinopoisk_client', SimpleNamespace(session=None))
+    monkeypatch.setattr(refresher_module, 'async_session_maker', session_maker)
+    monkeypatch.setattr(refresher_module, 'film_details_cache', TTLCache(max_entries=100, ttl=60))
+    monkeypatch.setattr(refresher_module, 'api_key_pool', ApiKeyPool(['key'], daily_quota=100, unauthorized_cooldown=60))
+    return requested
+
+
+def scheduler(budget: int = 10) -> RefreshScheduler:
+    return RefreshScheduler(interval=60, jitter=0, budget=budget, ahead=60, catalog_max_age=60 * 60,
+                            quota_reserve=0.5, retry_backoff=60 * 60)
+
+
+async def make_outdated(session, kinopoisk_ids: list, age: float = 24 * 60 * 60):
+    old = datetime.now(timezone.utc) - timedelta(seconds=age)
+    await session.execute(update(Catalog).where(Catalog.kinopoisk_id.in_(kinopoisk_ids)).values(updated_at=old))
+    await session.commit()
+
+
+async def test_outdated_catalog_rows_are_refreshed(session, user, upstream):
+    film_ids = await CatalogDAO.save_many([
+        {'kinopoisk_id': 1, 'film_name': 'Старое название', 'description': ''},
+        {'kinopoisk_id': 2, 'film_name': 'Свежий фильм', 'description': ''},
+    ], session)
+    await make_outdated(session, [1])
+    await FilmsDAO.add_favorite(user.id, film_ids[1], session)
+    version = await UsersDAO.get_favorites_version(user.id, session)
+
+    refresh = scheduler()
+    assert await refresh.run_once() == 1
+
+    assert upstream == [1]
+    assert (await CatalogDAO.get_by_kinopoisk_ids([1], session))[1].film_name == 'Новое название 1'
+    assert await CatalogDAO.get_outdated(datetime.now(timezone.utc) - timedelta(hours=1), 10, session) == []
+    # данные фильма изменились - меняется версия избранного (и его ETag)
+    assert await UsersDAO.get_favorites_version(user.id, session) == version + 1
+    assert refresh.stats()['refreshed'] == 1
+
+
+async def test_failed_rows_are_postponed(session, upstream):
+    await CatalogDAO.save_many([
+        {'kinopoisk_id': 901, 'film_name': 'Удален из Кинопоиска', 'description': ''},
+        {'kinopoisk_id': 3, 'film_name': 'Фильм', 'description': ''},
+    ], session)
+    await make_outdated(session, [901], age=2 * 24 * 60 * 60)
+    await make_outdated(session, [3])
+
+    refresh = scheduler(budget=1)
+    assert await refresh.run_once() == 0
+    assert upstream == [901]
+    assert (await CatalogDAO.get_by_kinopoisk_ids([901], session))[901].refresh_failures == 1
+
+    # отложенная строка не занимает бюджет следующего прохода
+    assert await refresh.run_once() == 1
+    assert upstream == [901, 3]
+    assert refresh.stats()['failed'] == 1
+
+
+async def test_popular_cache_entries_go_first(upstream):
+    cache = refresher_module.film_details_cache
+    for film_id, hits in ((1, 0), (2, 5), (3, 1)):
+        cache.set(film_id, Payload(b'{}'))
+        for _ in range(hits):
+            cache.get(film_id)
+
+    assert await scheduler(budget=1).run_once() == 1
+    # ни разу не прочитанная запись не обновляется, из остальных - самая популярная
+    assert upstream == [2]
+
+
+async def test_run_is_skipped_when_quota_is_low(upstream):
+    pool = refresher_module.api_key_pool
+    pool.keys[0].used_today = 60
+
+    refresh = scheduler()
+    assert await refresh.run_once() == 0
+    assert refresh.stats()['skipped_runs'] == 1
+    assert upstream == []
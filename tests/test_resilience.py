@@ -0,0 +1,57 @@
+import pytest
+
+from app.kinopoisk.resilience import CircuitBreaker, CircuitOpenError
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure()
+    breaker.allow()
+    breaker.record_success()
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.allow()
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.allow()
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.stats()['opened'] == 2
+
+
+def test_released_probe_lets_next_call_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.allow()
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    breaker.release()
+    breaker.allow()
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.kinopoisk.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.do('film', fetch) for _ in range(5)))
+    assert results == [1] * 5
+    assert flight.stats() == {'in_flight': 0, 'started': 1, 'joined': 4}
+    assert await flight.do('film', fetch) == 2
+
+
+async def test_exception_is_shared_and_key_is_released():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    results = await asyncio.gather(*(flight.do('film', fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert 'film' not in flight
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return 'done'
+
+    first = asyncio.ensure_future(flight.do('film', fetch))
+    second = asyncio.ensure_future(flight.do('film', fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == 'done'
+    assert first.cancelled()